@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
 import h5py
 import glob
@@ -23,13 +24,9 @@ def average_adc_and_weight_of_section(daq, adc_addr, section):
     return average_trace, weight
 
 
-def average_adc_of_run(daq, adc_addr, run_number):
-    total_trainID_inteval = daq.pulseIdIntervalOfRun(adc_addr, run_number)
-    section_length = 1000
-    sections = section_ID_intervals(total_trainID_inteval, section_length)
-    list_comp = np.array([average_adc_and_weight_of_section(daq, adc_addr, section) for section in sections])
-    trace = np.average(list_comp[:, 0], axis=0, weights=list_comp[:, 1])
-    return trace
+def average_adc_of_run(daq, adc_addr, run_number, max_workers=4):
+    running_average = reduce_run(daq, adc_addr, run_number, section_length=1000, max_workers=max_workers)
+    return running_average.average()
 
 
 def average_image_and_weight_of_section(daq, cam_addr, section):
@@ -40,13 +37,75 @@ def average_image_and_weight_of_section(daq, cam_addr, section):
     return average_image, number_of_images
 
 
-def average_image_of_run(daq, cam_addr, run_number):
-    total_trainID_inteval = daq.pulseIdIntervalOfRun(cam_addr, run_number)
-    section_length = 100
+def average_image_of_run(daq, cam_addr, run_number, max_workers=4):
+    running_average = reduce_run(daq, cam_addr, run_number, section_length=100, max_workers=max_workers)
+    return running_average.average()
+
+
+class RunningAverage:
+    """ Running sum (and sum of squares) and count of traces or images - partial results can be merged """
+
+    def __init__(self, with_std=False):
+        self.with_std = with_std
+        self.count = 0
+        self.sum = None
+        self.sum_of_squares = None
+
+    def add(self, values):
+        """ Adds a batch of traces/images (1st dimension = trains) - reduced along the trains in one step """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return self
+        if self.sum is None:
+            self.sum = np.zeros(values.shape[1:])
+            if self.with_std:
+                self.sum_of_squares = np.zeros(values.shape[1:])
+        self.sum += values.sum(axis=0)
+        if self.with_std:
+            self.sum_of_squares += np.square(values).sum(axis=0)
+        self.count += len(values)
+        return self
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.sum, self.sum_of_squares, self.count = other.sum, other.sum_of_squares, other.count
+            return self
+        self.sum = self.sum + other.sum
+        if self.with_std:
+            self.sum_of_squares = self.sum_of_squares + other.sum_of_squares
+        self.count += other.count
+        return self
+
+    def average(self):
+        assert self.count != 0, 'no values added'
+        return self.sum / self.count
+
+    def std(self):
+        assert self.with_std, 'sum of squares is not accumulated - use with_std=True'
+        return np.sqrt(np.maximum(self.sum_of_squares / self.count - self.average() ** 2, 0))
+
+
+def reduce_section(daq, addr, section, with_std=False):
+    return RunningAverage(with_std).add(daq.valuesOfInterval(addr, section))
+
+
+def reduce_run(daq, addr, run_number, section_length=100, max_workers=4, with_std=False, processes=False):
+    """
+    Returns the RunningAverage of all traces/images of *addr* in *run_number*.
+    The sections are read in a thread pool (*processes* = True: process pool, the *daq* must be picklable).
+    *daq* is any object with the BeamtimeDaqAccess methods pulseIdIntervalOfRun and valuesOfInterval.
+    """
+    total_trainID_inteval = daq.pulseIdIntervalOfRun(addr, run_number)
     sections = section_ID_intervals(total_trainID_inteval, section_length)
-    list_comp = np.array([average_image_and_weight_of_section(daq, cam_addr, section) for section in sections])
-    image = np.average(list_comp[:, 0], axis=0, weights=list_comp[:, 1])
-    return image
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    running_average = RunningAverage(with_std)
+    with executor_class(max_workers=max_workers) as executor:
+        for section_average in executor.map(reduce_section, [daq] * len(sections), [addr] * len(sections),
+                                            sections, [with_std] * len(sections)):
+            running_average.merge(section_average)
+    return running_average
 
 
 def print_existing_datasets(root_dir, run_number, contains=None):
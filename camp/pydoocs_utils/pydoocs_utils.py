@@ -1,13 +1,20 @@
 import collections
-import pydoocs
 import numpy as np
 from datetime import datetime
 import time
-from typing import Tuple
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, NamedTuple
 import re
 import os.path
 import h5py
 
+try:
+    import pydoocs
+except ImportError:  # e.g. offline analysis - a backend like camp.utils.mock.FakePydoocs can be passed instead
+    pydoocs = None
+
 
 def get_current_train_id() -> int:
     """Returns current train_ID from reliable source"""
@@ -15,61 +22,89 @@ def get_current_train_id() -> int:
     return train_id
 
 
+class TrainTiming(NamedTuple):
+    '''timing of one train in TrainAbo.trains [s]'''
+    train_id: int
+    read: float  # pydoocs.read calls until the new train arrived
+    validation: float
+    write: float  # time the consumer spent on the train, e.g. the HDF5 write in to_hdf
+
+
 class TrainAbo:
 
-    def __init__(self, doocs_addr: str):
+    def __init__(self, doocs_addr: str, backend=None, timing_hook=None):
+        """ *backend* replaces the pydoocs module, e.g. camp.utils.mock.FakePydoocs,
+         *timing_hook* is called with a TrainTiming obj for every train """
         self.doocs_addr = doocs_addr
         self.train_id = 0
+        self.pydoocs = pydoocs if backend is None else backend
+        self.timing_hook = timing_hook
+        self._validated_keys = None
 
     def channel_keys(self) -> collections.abc.KeysView:
-        pydoocs_dict = pydoocs.read(self.doocs_addr)
+        pydoocs_dict = self.pydoocs.read(self.doocs_addr)
         assert isinstance(pydoocs_dict, dict)
         return pydoocs_dict.keys()
 
-    def trains(self, number_of_trains: int) -> dict:
+    def trains(self, number_of_trains: int, key_list=None) -> dict:
         """ Retruns *number_of_trains* unique trains as generator
-         *number_of_trains* = -1 will loop indefinitely"""
+         *number_of_trains* = -1 will loop indefinitely
+         The keys (*key_list*) are validated on the fetched dict whenever the set of keys changes"""
         number_of_passed_train = 0
+        read_time = 0
         while (number_of_passed_train < number_of_trains) or number_of_trains == -1:
-            pydoocs_dict = pydoocs.read(self.doocs_addr)
-            self.assert_pydoocs_dict()
+            start = time.perf_counter()
+            pydoocs_dict = self.pydoocs.read(self.doocs_addr)
+            read_time += time.perf_counter() - start
             current_id = pydoocs_dict['macropulse']
             assert current_id != 0, '{} returns trainID: 0'.format(self.doocs_addr)
             if self.train_id != current_id:
+                start = time.perf_counter()
+                if self._validated_keys != (frozenset(pydoocs_dict), key_list):
+                    self.assert_pydoocs_dict(key_list, pydoocs_dict=pydoocs_dict)
+                    self._validated_keys = (frozenset(pydoocs_dict), key_list)
+                validation_time = time.perf_counter() - start
                 self.train_id = current_id
+                start = time.perf_counter()
                 yield pydoocs_dict
+                if self.timing_hook is not None:
+                    self.timing_hook(TrainTiming(current_id, read_time, validation_time, time.perf_counter() - start))
+                read_time = 0
                 number_of_passed_train += 1
             else:
                 time.sleep(0.01)
 
-    def to_hdf(self, filename: str, key_list: list, number_of_trains: int) -> None:
+    def to_hdf(self, filename: str, key_list: list, number_of_trains: int, buffer_size: int = 100,
+               compression: str = None) -> None:
+        """ Writes *number_of_trains* trains to HDF5 - *number_of_trains* = -1 records until KeyboardInterrupt.
+         Trains are buffered and appended blockwise, see TrainWriter"""
         self.assert_to_hdf(filename, key_list, number_of_trains)
-        pydoocs_dict = pydoocs.read(self.doocs_addr)
-        self.assert_pydoocs_dict(key_list)
-        number_of_passed_train = 0
-        dset = {}
-        with h5py.File(filename, "w") as f:
-            for key in key_list:
-                if type(pydoocs_dict[key]) in [int, float]:
-                    dset[key] = f.create_dataset(key, (number_of_trains,), dtype=np.dtype(type(pydoocs_dict[key])))
-                if isinstance(pydoocs_dict[key], np.ndarray):
-                    dset[key] = f.create_dataset(key, (
-                        number_of_trains, pydoocs_dict[key].shape[0], pydoocs_dict[key].shape[1]))
-                if isinstance(pydoocs_dict[key], str):
-                    key_list.remove(key)
-                    f.attrs[key] = pydoocs_dict[key]
-                    print('The following key is a string and therefore appended as file.attribute: {}'.format(key))
-            for channel in self.trains(number_of_trains):
-                for key in key_list:
-                    try:
-                        dset[key][number_of_passed_train] = channel[key]
-                    except:
-                        pass
-                number_of_passed_train += 1
-        print('Done - Writing {} trains to HDF5.'.format(number_of_trains))
+        with TrainWriter(filename, key_list, buffer_size=buffer_size, compression=compression) as writer:
+            try:
+                for channel in self.trains(number_of_trains, key_list):
+                    writer.append(channel)
+            except KeyboardInterrupt:
+                print('Recording stopped.')
+        print('Done - Writing {} trains to HDF5.'.format(writer.number_of_trains))
+        if writer.missed_train_ids or writer.dropped_train_ids:
+            print('Missed trains: {} | Dropped trains: {}'.format(len(writer.missed_train_ids),
+                                                                 len(writer.dropped_train_ids)))
+
+    def record(self, filename: str, key_list: list, number_of_trains: int, queue_size: int = 1000,
+               buffer_size: int = 100, compression: str = None) -> 'RecordingPipeline':
+        """ Same as to_hdf but polling and writing run in separate threads, see RecordingPipeline """
+        self.assert_to_hdf(filename, key_list, number_of_trains)
+        with TrainWriter(filename, key_list, buffer_size=buffer_size, compression=compression) as writer:
+            pipeline = RecordingPipeline(self, writer, queue_size=queue_size)
+            pipeline.run(number_of_trains, key_list)
+        print('Done - Writing {} trains to HDF5.'.format(writer.number_of_trains))
+        print(pipeline.statistics())
+        return pipeline
 
-    def assert_pydoocs_dict(self, key_list=None) -> None:
-        pydoocs_dict = pydoocs.read(self.doocs_addr)
+    def assert_pydoocs_dict(self, key_list=None, pydoocs_dict=None) -> None:
+        """ Validates *pydoocs_dict* - reads the channel only if no dict is given """
+        if pydoocs_dict is None:
+            pydoocs_dict = self.pydoocs.read(self.doocs_addr)
         if not key_list:
             key_list = ["data", "macropulse"]
         for key in key_list:
@@ -79,17 +114,289 @@ class TrainAbo:
         assert isinstance(filename, str)
         assert os.path.isfile(filename) != True, 'file already exist'
         assert isinstance(number_of_trains, int)
-        assert number_of_trains > 0
+        assert number_of_trains > 0 or number_of_trains == -1
         assert isinstance(key_list, list)
         assert len(key_list) != 0
         self.assert_pydoocs_dict(key_list)
 
 
+class MultiTrainAbo:
+    """ Polls several DOOCS addresses concurrently with a thread pool and groups the samples by macropulse.
+     A train is emitted as soon as all channels delivered it - trains which are still incomplete when
+     *max_pending_trains* newer trains arrived are emitted with 'complete' = False (or skipped).
+     Samples of trains which were already emitted (or skipped) arrive too late and are only counted."""
+
+    def __init__(self, doocs_addrs: list, backend=None, max_workers: int = None, max_pending_trains: int = 10):
+        assert len(doocs_addrs) == len(set(doocs_addrs)), 'duplicate DOOCS addresses'
+        self.doocs_addrs = list(doocs_addrs)
+        self.pydoocs = pydoocs if backend is None else backend
+        self.max_workers = max_workers or len(self.doocs_addrs)
+        self.max_pending_trains = max_pending_trains
+        self.incomplete_train_ids = []
+        self.number_of_late_samples = 0
+
+    def trains(self, number_of_trains: int, complete_only: bool = True) -> dict:
+        """ Retruns *number_of_trains* trains {'macropulse': id, 'complete': bool, doocs_addr: pydoocs_dict, ...}
+         as generator in ascending order - *number_of_trains* = -1 will loop indefinitely"""
+        number_of_passed_train = 0
+        self.incomplete_train_ids = []
+        self.number_of_late_samples = 0
+        last_train_ids = {doocs_addr: 0 for doocs_addr in self.doocs_addrs}
+        last_emitted_train_id = 0
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while (number_of_passed_train < number_of_trains) or number_of_trains == -1:
+                new_sample = False
+                for doocs_addr, pydoocs_dict in zip(self.doocs_addrs,
+                                                    executor.map(self.pydoocs.read, self.doocs_addrs)):
+                    train_id = pydoocs_dict['macropulse']
+                    assert train_id != 0, '{} returns trainID: 0'.format(doocs_addr)
+                    if train_id != last_train_ids[doocs_addr]:
+                        last_train_ids[doocs_addr] = train_id
+                        new_sample = True
+                        if train_id <= last_emitted_train_id:
+                            self.number_of_late_samples += 1
+                            continue
+                        pending.setdefault(train_id, {})[doocs_addr] = pydoocs_dict
+                if not new_sample:
+                    time.sleep(0.01)
+                while pending and ((number_of_passed_train < number_of_trains) or number_of_trains == -1):
+                    oldest_train_id = min(pending)
+                    complete = len(pending[oldest_train_id]) == len(self.doocs_addrs)
+                    if not complete and max(pending) - oldest_train_id < self.max_pending_trains:
+                        break
+                    channels = pending.pop(oldest_train_id)
+                    last_emitted_train_id = oldest_train_id
+                    if not complete:
+                        self.incomplete_train_ids.append(oldest_train_id)
+                        if complete_only:
+                            continue
+                    train = {'macropulse': oldest_train_id, 'complete': complete}
+                    train.update(channels)
+                    yield train
+                    number_of_passed_train += 1
+
+    def to_hdf(self, filename: str, key_list: list, number_of_trains: int, buffer_size: int = 100,
+               compression: str = None) -> None:
+        """ Writes the complete trains into one HDF5 file - datasets '<doocs_addr>/<key>' and 'macropulse' """
+        flat_key_list = ['macropulse'] + ['{}/{}'.format(doocs_addr, key)
+                                          for doocs_addr in self.doocs_addrs for key in key_list]
+        with TrainWriter(filename, flat_key_list, buffer_size=buffer_size, compression=compression) as writer:
+            try:
+                for train in self.trains(number_of_trains):
+                    flat_train = {'macropulse': train['macropulse']}
+                    for doocs_addr in self.doocs_addrs:
+                        for key in key_list:
+                            flat_train['{}/{}'.format(doocs_addr, key)] = train[doocs_addr][key]
+                    writer.append(flat_train)
+            except KeyboardInterrupt:
+                print('Recording stopped.')
+            writer.write_attribute('incomplete train ids', np.array(self.incomplete_train_ids, dtype=np.int64))
+        print('Done - Writing {} trains to HDF5.'.format(writer.number_of_trains))
+
+
+class TrainWriter:
+    """ Buffered HDF5 writer for pydoocs dicts: *buffer_size* trains are collected in RAM and appended
+     as one block to chunked, resizable (and optionally compressed) datasets. String channels are stored
+     as file attributes, channels without HDF5 data type (e.g. dicts) are skipped. Gaps in the macropulse
+     numbers are reported as missed_train_ids, trains which do not match the datasets (missing key, other shape)
+     as dropped_train_ids and both are stored in the file.
+     The HDF5 chunks hold about *chunk_bytes* (at least one train) independent of the RAM buffer, so that
+     reading single trains of large camera frames does not decompress whole buffer blocks."""
+    chunk_bytes = 2 ** 20
+
+    def __init__(self, filename: str, key_list: list, buffer_size: int = 100, compression: str = None):
+        assert isinstance(filename, str)
+        assert os.path.isfile(filename) != True, 'file already exist'
+        assert isinstance(buffer_size, int) and buffer_size > 0
+        self.filename = filename
+        self.key_list = list(key_list)
+        self.buffer_size = buffer_size
+        self.compression = compression
+        self.number_of_trains = 0
+        self.missed_train_ids = []
+        self.dropped_train_ids = []
+        self._last_train_id = None
+        self._dsets = None
+        self._buffer = {}
+        self._number_of_buffered_trains = 0
+        self._h5file = h5py.File(filename, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def append(self, pydoocs_dict: dict) -> None:
+        train_id = pydoocs_dict['macropulse']
+        if self._last_train_id is not None and train_id > self._last_train_id + 1:
+            self.missed_train_ids.extend(range(self._last_train_id + 1, train_id))
+        self._last_train_id = train_id
+        if self._dsets is None:
+            self.__create_datasets(pydoocs_dict)
+        try:
+            values = {key: np.asarray(pydoocs_dict[key]) for key in self._dsets}
+        except KeyError:
+            self.dropped_train_ids.append(train_id)
+            return
+        if any(values[key].shape != self._dsets[key].shape[1:] for key in values):
+            self.dropped_train_ids.append(train_id)
+            return
+        for key in values:
+            self._buffer[key].append(values[key])
+        self._number_of_buffered_trains += 1
+        if self._number_of_buffered_trains >= self.buffer_size:
+            self.flush()
+
+    def __create_datasets(self, pydoocs_dict: dict) -> None:
+        self._dsets = {}
+        for key in list(self.key_list):
+            value = pydoocs_dict[key]
+            if isinstance(value, str):
+                self.key_list.remove(key)
+                self._h5file.attrs[key] = value
+                print('The following key is a string and therefore appended as file.attribute: {}'.format(key))
+                continue
+            value = np.asarray(value)
+            if value.dtype == object:
+                self.key_list.remove(key)
+                print('The following key has no HDF5 data type and is therefore not written: {}'.format(key))
+                continue
+            self._dsets[key] =self._h5file.create_dataset(key, shape=(0,) + value.shape, dtype=value.dtype,
+                                                           maxshape=(None,) + value.shape,
+                                                           chunks=(self.__trains_per_chunk(value),) + value.shape,
+                                                           compression=self.compression)
+            self._buffer[key] = []
+
+    def __trains_per_chunk(self, value: np.ndarray) -> int:
+        return max(1, self.chunk_bytes // max(value.nbytes, 1))
+
+    def write_attribute(self, key: str, value) -> None:
+        self._h5file.attrs[key] = value
+
+    def flush(self) -> None:
+        if self._number_of_buffered_trains == 0:
+            return
+        for key, dset in self._dsets.items():
+            dset.resize(self.number_of_trains + self._number_of_buffered_trains, axis=0)
+            dset[self.number_of_trains:] = np.stack(self._buffer[key])
+            self._buffer[key] = []
+        self.number_of_trains += self._number_of_buffered_trains
+        self._number_of_buffered_trains = 0
+
+    def close(self) -> None:
+        if not self._h5file:
+            return
+        self.flush()
+        self._h5file.attrs['missed train ids'] = np.array(self.missed_train_ids, dtype=np.int64)
+        self._h5file.attrs['dropped train ids'] = np.array(self.dropped_train_ids, dtype=np.int64)
+        self._h5file.close()
+
+
+class RecordingPipeline:
+    """ Producer/consumer recording: a reader thread polls the trains of *train_abo* into a bounded queue,
+     the calling thread drains the queue into *writer* (e.g. TrainWriter). A slow write does not stall the
+     polling - if the queue is full, trains are dropped and counted. statistics() returns queue depth,
+     read-to-write latency and drop count."""
+
+    def __init__(self, train_abo: TrainAbo, writer, queue_size: int = 1000):
+        self.train_abo = train_abo
+        self.writer = writer
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._consumer_finished = threading.Event()
+        self._reader_error = None
+        self.number_of_trains = 0
+        self.dropped_train_ids = []
+        self.max_queue_depth = 0
+        self._sum_of_latencies = 0.0
+        self._max_latency = 0.0
+
+    def run(self, number_of_trains: int, key_list: list = None) -> None:
+        """ Records *number_of_trains* trains (-1 until stop() or KeyboardInterrupt) - blocks until done.
+         If the writer fails, the reader is stopped and joined before the exception is raised."""
+        reader = threading.Thread(target=self.__read, args=(number_of_trains, key_list), daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                read_time, pydoocs_dict = item
+                self.writer.append(pydoocs_dict)
+                latency = time.time() - read_time
+                self._sum_of_latencies += latency
+                self._max_latency = max(self._max_latency, latency)
+                self.number_of_trains += 1
+        except KeyboardInterrupt:
+            print('Recording stopped.')
+            self.stop()
+            self.__drain()
+        finally:
+            self.stop()
+            self._consumer_finished.set()
+            self.__discard()
+            reader.join()
+        if self._reader_error is not None:
+            raise self._reader_error
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def __read(self, number_of_trains, key_list):
+        try:
+            for pydoocs_dict in self.train_abo.trains(number_of_trains, key_list):
+                if self._stop.is_set():
+                    break
+                try:
+                    self._queue.put_nowait((time.time(), pydoocs_dict))
+                except queue.Full:
+                    self.dropped_train_ids.append(pydoocs_dict['macropulse'])
+                self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        except Exception as error:
+            self._reader_error = error
+        finally:
+            while True:  # end marker - not needed any more if the consumer has already finished
+                try:
+                    self._queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._consumer_finished.is_set():
+                        break
+
+    def __drain(self):
+        """ Writes the already queued trains after a stop """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self.writer.append(item[1])
+            self.number_of_trains += 1
+
+    def __discard(self):
+        """ Empties the queue without writing, so that a blocked reader can finish """
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def statistics(self) -> dict:
+        return {'written trains': self.number_of_trains,
+                'dropped trains': len(self.dropped_train_ids),
+                'queue depth': self._queue.qsize(),
+                'max queue depth': self.max_queue_depth,
+                'mean latency [s]': self._sum_of_latencies / max(self.number_of_trains, 1),
+                'max latency [s]': self._max_latency}
+
+
 class TrainFile:
 
     def __init__(self, filename: str):
         self._h5file = None
         self._filename = filename
+        self._macropulses = None
 
     def __enter__(self):
         self.assert_to_hdf()
@@ -98,6 +405,17 @@ class TrainFile:
 
     def __exit__(self, type, value, traceback):
         self._h5file.close()
+        self._macropulses = None
+
+    def __getitem__(self, key) -> 'TrainDataset':
+        """ Lazy view of the channel *key* - train_file[key][train_id_start:train_id_stop] """
+        return TrainDataset(self._h5file[key], self.macropulses())
+
+    def macropulses(self) -> np.ndarray:
+        if self._macropulses is None:
+            self._macropulses = self._h5file['macropulse'][()]
+            assert np.all(self._macropulses[1:] > self._macropulses[:-1]), 'macropulses are not ascending'
+        return self._macropulses
 
     def contains(self):
         print(f'Groups: {list(self._h5file.keys())}')
@@ -116,11 +434,91 @@ class TrainFile:
         assert os.path.isfile(self._filename) == True, 'file do not exists'
 
 
+class TrainDataset:
+    """ Lazy view of a channel of a TrainFile - indexed and sliced by train ID (macropulse) instead of row.
+     Only the selected trains are read; batches() and the reducers stream over blocks of trains."""
+
+    def __init__(self, dset: h5py.Dataset, macropulses: np.ndarray):
+        assert len(dset) == len(macropulses), 'channel and macropulse have different length'
+        self._dset = dset
+        self.macropulses = macropulses
+        self.shape = dset.shape
+        self.dtype = dset.dtype
+
+    def __len__(self):
+        return len(self._dset)
+
+    def __getitem__(self, item):
+        """ train_dataset[train_id] or train_dataset[train_id_start:train_id_stop] (stop excluded) """
+        if isinstance(item, slice):
+            assert item.step is None, 'steps are not supported'
+            return self._dset[self.__row_slice(item.start, item.stop)]
+        row = np.searchsorted(self.macropulses, item)
+        if row == len(self.macropulses) or self.macropulses[row] != item:
+            raise KeyError('train ID {} is not included'.format(item))
+        return self._dset[row]
+
+    def __row_slice(self, train_id_start=None, train_id_stop=None) -> slice:
+        row_start = 0 if train_id_start is None else np.searchsorted(self.macropulses, train_id_start)
+        row_stop = len(self.macropulses) if train_id_stop is None else np.searchsorted(self.macropulses,
+                                                                                       train_id_stop)
+        return slice(int(row_start), int(row_stop))
+
+    def batches(self, batch_size: int = None, train_id_start=None, train_id_stop=None):
+        """ Yields (train_ids, data) of at most *batch_size* trains - default: HDF5 chunk size """
+        if batch_size is None:
+            batch_size = self._dset.chunks[0] if self._dset.chunks else 100
+        rows = self.__row_slice(train_id_start, train_id_stop)
+        for start in range(rows.start, rows.stop, batch_size):
+            stop = min(start + batch_size, rows.stop)
+            yield self.macropulses[start:stop], self._dset[start:stop]
+
+    def sum(self, batch_size: int = None, train_id_start=None, train_id_stop=None) -> np.ndarray:
+        return self.__reduce(batch_size, train_id_start, train_id_stop)[1]
+
+    def mean(self, batch_size: int = None, train_id_start=None, train_id_stop=None) -> np.ndarray:
+        count, total, _ = self.__reduce(batch_size, train_id_start, train_id_stop)
+        return total / count
+
+    def std(self, batch_size: int = None, train_id_start=None, train_id_stop=None) -> np.ndarray:
+        count, total, total_of_squares = self.__reduce(batch_size, train_id_start, train_id_stop, squares=True)
+        return np.sqrt(np.maximum(total_of_squares / count - (total / count) ** 2, 0))
+
+    def __reduce(self, batch_size, train_id_start, train_id_stop, squares=False):
+        count, total, total_of_squares = 0, np.zeros(self.shape[1:]), None
+        if squares:
+            total_of_squares = np.zeros(self.shape[1:])
+        for _, data in self.batches(batch_size, train_id_start, train_id_stop):
+            data = data.astype(float)
+            count += len(data)
+            total += data.sum(axis=0)
+            if squares:
+                total_of_squares += (data ** 2).sum(axis=0)
+        assert count != 0, 'no trains selected'
+        return count, total, total_of_squares
+
+
 class DoocsHistory:
+    """
+    Reads the DOOCS history of *doocs_addr* in chunks of *chunk_duration* seconds (aligned to multiples of it),
+    at most *points_per_chunk* points each, fetched concurrently by *max_workers* threads and stitched together.
+    With a *cache_dir* every complete chunk is stored on disk, so overlapping queries only fetch missing chunks.
+    Ranges shorter than *chunk_duration* are read directly with *points_per_chunk* points (not cached).
+    """
 
-    def __init__(self, doocs_addr: str):
+    def __init__(self, doocs_addr: str, backend=None, cache_dir: str = None, chunk_duration: int = 3600,
+                 points_per_chunk: int = 256, max_workers: int = 4):
         assert doocs_addr.endswith('.HIST'), 'no valid DOOCS history address'
+        assert chunk_duration > 0 and points_per_chunk > 0
         self.doocs_addr = doocs_addr
+        self.pydoocs = pydoocs if backend is None else backend
+        self.chunk_duration = int(chunk_duration)
+        self.points_per_chunk = int(points_per_chunk)
+        self.max_workers = max_workers
+        self.cache_dir = None
+        if cache_dir is not None:
+            self.cache_dir = os.path.join(cache_dir, re.sub('[^A-Za-z0-9._-]', '_', doocs_addr))
+            os.makedirs(self.cache_dir, exist_ok=True)
 
     def time_to_timestamp(self, time: str):
         """Transforms time_string to timestamp"""
@@ -128,21 +526,54 @@ class DoocsHistory:
 
     def get_doocs_history(self, start_time: str, stop_time: str) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Returns a np.array of datetime objects and a np.array
+        Returns a np.array of datetime64 (local time) and a np.array
         of DOOCS values ['data'] from the DOOOCS history for
         a given time interval
         """
         self.assert_time_string([start_time, stop_time])
         self.start_time = self.time_to_timestamp(start_time)
         self.stop_time = self.time_to_timestamp(stop_time)
-        pydoocs_dict = pydoocs.read(self.doocs_addr, parameters=[self.start_time, self.stop_time, 256, 0])
-        self.assert_pydoocs_dict(pydoocs_dict)
-        timestamps = np.array(pydoocs_dict["data"])[:, 0]
-        values = np.array(pydoocs_dict["data"])[:, 1]
-        times = np.array([datetime.fromtimestamp(timestamp) for timestamp in timestamps])
+        assert self.start_time < self.stop_time, 'start_time has to be before stop_time'
+        if self.stop_time - self.start_time < self.chunk_duration:
+            history = self.__read(self.start_time, self.stop_time)
+        else:
+            first_chunk = int(self.start_time // self.chunk_duration) * self.chunk_duration
+            chunk_starts = range(first_chunk, int(np.ceil(self.stop_time)), self.chunk_duration)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                chunks = list(executor.map(self.get_chunk, chunk_starts))
+            history = np.concatenate(chunks)
+        history = history[(history[:, 0] >= self.start_time) & (history[:, 0] <= self.stop_time)]
+        _, first_occurrences = np.unique(history[:, 0], return_index=True)  # chunk borders can be read twice
+        history = history[first_occurrences]
+        times = timestamps_to_datetime64(history[:, 0])
+        values = history[:, 1]
         self.assert_return_values(times, values)
         return times, values
 
+    def get_chunk(self, chunk_start: int) -> np.ndarray:
+        """ (N, 2) array of timestamps and values of [chunk_start, chunk_start + chunk_duration] """
+        cache_file = self.cache_file(chunk_start)
+        if cache_file is not None and os.path.isfile(cache_file):
+            return np.load(cache_file)
+        chunk_stop = chunk_start + self.chunk_duration
+        chunk = self.__read(chunk_start, chunk_stop)
+        if cache_file is not None and chunk_stop < time.time():  # the current chunk is not complete yet
+            temporary_file = cache_file + '.tmp.npy'
+            np.save(temporary_file, chunk)
+            os.replace(temporary_file, cache_file)
+        return chunk
+
+    def __read(self, start: float, stop: float) -> np.ndarray:
+        pydoocs_dict = self.pydoocs.read(self.doocs_addr, parameters=[start, stop, self.points_per_chunk, 0])
+        self.assert_pydoocs_dict(pydoocs_dict)
+        return np.array(pydoocs_dict['data'], dtype=float).reshape(-1, 2)
+
+    def cache_file(self, chunk_start: int):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, '{}_{}_{}.npy'.format(chunk_start, self.chunk_duration,
+                                                                 self.points_per_chunk))
+
     def assert_time_string(start_time, times):
         for time in times:
             assert isinstance(time, str), "time have to be str"
@@ -158,7 +589,27 @@ class DoocsHistory:
     def assert_return_values(self, times, values):
         assert isinstance(times, np.ndarray)
         assert len(times) != 0
-        assert isinstance(times[0], datetime)
+        assert np.issubdtype(times.dtype, np.datetime64)
         assert len(times) == len(values)
 
 
+def timestamps_to_datetime64(timestamps: np.ndarray) -> np.ndarray:
+    """ Unix timestamps to naive local datetime64[us] - as datetime.fromtimestamp, but vectorized.
+     The UTC offset is sampled every hour, only timestamps in an hour with a DST transition are converted
+     one by one."""
+    timestamps = np.asarray(timestamps, dtype=float)
+    seconds = np.floor(timestamps)  # timestamps - seconds is exact, the microseconds are rounded like datetime
+    times = (seconds.astype('int64') * 10 ** 6 + np.round((timestamps - seconds) * 10 ** 6).astype('int64')
+             ).astype('datetime64[us]')
+    if len(times) == 0:
+        return times
+    samples = np.arange(np.floor(timestamps.min() / 3600) * 3600, timestamps.max() + 3600 + 1, 3600)
+    offsets = np.array([datetime.fromtimestamp(sample).astimezone().utcoffset().total_seconds()
+                        for sample in samples])
+    hours = np.searchsorted(samples, timestamps, side='right') - 1
+    times = times + (offsets[hours] * 10 ** 6).astype('int64').astype('timedelta64[us]')
+    transitions = np.flatnonzero(offsets[hours] != offsets[hours + 1])
+    if len(transitions) != 0:
+        times[transitions] = np.array([datetime.fromtimestamp(timestamps[index]) for index in transitions],
+                                      dtype='datetime64[us]')
+    return times
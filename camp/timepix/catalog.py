@@ -0,0 +1,87 @@
+import os
+import json
+from pathlib import Path
+import numpy as np
+import camp
+from camp.utils.utils import file_signature
+
+
+class RunCatalog:
+    """
+    On-disk catalog of TimePixRun metadata keyed by file system and run number.
+    Holds the resolved HDF5 file, its attributes, the pump-probe delay and the FLASH run number,
+    so that a run can be opened without globbing the data directory or opening the HDF5 file.
+    Every entry is invalidated by the mtime/size of the file it was read from.
+    New entries are kept in memory until save() - or the end of a with block - merges them into the file.
+    """
+    attributes = ['recorded_trigger', 'recorded_trainIDs', 'number_of_raw_events',
+                  'number_of_centroided_events', 'trainID_shift', 'corr_coeff']
+
+    def __init__(self, catalog_file=None):
+        if catalog_file is None:
+            catalog_file = os.path.join(os.path.dirname(camp.__file__), '../data/timepix_catalog.json')
+        self.catalog_file = Path(catalog_file)
+        self.entries = self.__load()
+        self.__changed = set()  # (file system, run number) of the entries changed since the last save
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.save()
+
+    def __load(self):
+        if not self.catalog_file.is_file():
+            return {}
+        with open(self.catalog_file, 'r') as json_file:
+            return json.load(json_file)
+
+    def __entry(self, run):
+        self.__changed.add((run.file_system, str(run.run_number)))
+        return self.entries.setdefault(run.file_system, {}).setdefault(str(run.run_number), {})
+
+    def restore(self, run) -> bool:
+        """ Sets hdf_file and the attributes of *run* from the catalog - returns False if missing or outdated """
+        entry = self.entries.get(run.file_system, {}).get(str(run.run_number), {})
+        if 'hdf_file' not in entry:
+            return False
+        try:
+            if list(file_signature(entry['hdf_file'])) != entry['signature']:
+                return False
+        except FileNotFoundError:
+            return False
+        run.hdf_file = Path(entry['hdf_file'])
+        for attribute in self.attributes:
+            setattr(run, attribute, entry['attributes'][attribute])
+        return True
+
+    def store(self, run) -> None:
+        entry = self.__entry(run)
+        entry.clear()
+        entry['hdf_file'] = str(run.hdf_file)
+        entry['signature'] = list(file_signature(run.hdf_file))
+        entry['attributes'] = {attribute: np.asarray(getattr(run, attribute)).item() for attribute in self.attributes}
+
+    def get_value(self, run, key, source_file):
+        """ Returns (found, value) of *key* for *run* if it is up to date with *source_file* """
+        entry = self.entries.get(run.file_system, {}).get(str(run.run_number), {})
+        if key in entry and entry[key]['signature'] == list(file_signature(source_file)):
+            return True, entry[key]['value']
+        return False, None
+
+    def set_value(self, run, key, value, source_file) -> None:
+        self.__entry(run)[key] = {'value': value, 'signature': list(file_signature(source_file))}
+
+    def save(self) -> None:
+        """ Writes the changed entries - merged into the current file, so that other sessions keep their entries """
+        if not self.__changed:
+            return
+        entries = self.__load()
+        for file_system, run_number in self.__changed:
+            entries.setdefault(file_system, {}).setdefault(run_number, {}).update(self.entries[file_system][run_number])
+        self.entries = entries
+        self.__changed = set()
+        temporary_file = self.catalog_file.with_name(self.catalog_file.name + '.tmp')
+        with open(temporary_file, 'w') as json_file:
+            json.dump(self.entries, json_file)
+        os.replace(temporary_file, self.catalog_file)
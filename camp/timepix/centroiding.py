@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import h5py
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from camp.timepix.run import TimePixRun
+
+
+def _centroid_section(centroider, hdf_file, selection):
+    with h5py.File(hdf_file, 'r') as h_file:
+        hits = {parameter: h_file['raw/' + parameter][selection] for parameter in TimePixRun.raw_datasets}
+    return centroider.cluster(hits['x'], hits['y'], hits['tof'], hits['tot'], hits['trigger nr'])
+
+
+class Centroider():
+    """
+    Clusters the raw hits of a Timepix run into centroided events. Hits of the same trigger nr with
+    tot >= *tot_threshold* belong to the same cluster if they are connected by a chain of hits which are at most
+    *max_distance* px apart in x and y (max_distance = 1: 8 neighbours) and *time_window* seconds apart in ToF.
+    Neighbours are found by a binary search on the sorted (trigger, x, y) pixel keys (grid hash) and the clusters
+    are the connected components of the neighbour graph. x, y are ToT weighted, tof is the ToF of the hit with
+    the largest ToT - the columns are the ones of TimePixRun.centroided_datasets.
+    """
+    pixel = 256  # number of pixel per axis
+
+    def __init__(self, tot_threshold=0, max_distance=1, time_window=5e-7, min_clustersize=1):
+        assert isinstance(max_distance, int) and max_distance >= 0, 'max_distance has to be a positive integer'
+        self.tot_threshold = tot_threshold
+        self.max_distance = max_distance
+        self.time_window = time_window
+        self.min_clustersize = min_clustersize
+
+    def cluster(self, x, y, tof, tot, trigger_nr):
+        """ Returns the centroided events of the raw hits as dict - all hits of a trigger nr have to be given """
+        selected = np.asarray(tot) >= self.tot_threshold
+        x, y = np.asarray(x)[selected].astype(np.int64), np.asarray(y)[selected].astype(np.int64)
+        tof, tot = np.asarray(tof, dtype=float)[selected], np.asarray(tot, dtype=float)[selected]
+        trigger_nr = np.asarray(trigger_nr)[selected]
+        assert np.all(x < self.pixel) and np.all(y < self.pixel), 'pixel out of range'
+        labels = self.__labels(x, y, tof, trigger_nr)
+        return self.__centroids(labels, x, y, tof, tot, trigger_nr)
+
+    def __labels(self, x, y, tof, trigger_nr):
+        """ Cluster index of every hit """
+        number_of_hits = len(x)
+        if number_of_hits == 0:
+            return np.array([], dtype=np.int64)
+        width = self.pixel + 2 * self.max_distance  # neighbours of the border pixel do not wrap around
+        shot = np.unique(trigger_nr, return_inverse=True)[1].ravel().astype(np.int64)
+        keys = (shot * width + x + self.max_distance) * width + y + self.max_distance
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        pixel_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        pixel_keys = sorted_keys[pixel_starts]
+        pixel_counts = np.diff(np.append(pixel_starts, number_of_hits))
+        first, second = [], []
+        for dx in range(0, self.max_distance + 1):
+            for dy in range(-self.max_distance, self.max_distance + 1):
+                if dx == 0 and dy < 0:  # each pair of pixels once
+                    continue
+                neighbour_keys = sorted_keys + dx * width + dy
+                pixel = np.minimum(np.searchsorted(pixel_keys, neighbour_keys), len(pixel_keys) - 1)
+                starts = pixel_starts[pixel]
+                counts = np.where(pixel_keys[pixel] == neighbour_keys, pixel_counts[pixel], 0)
+                # every hit is paired with all hits of the neighbour pixel (positions in the sorted keys)
+                hits = np.repeat(np.arange(number_of_hits), counts)
+                neighbours = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                pairs = neighbours > hits if dx == 0 and dy == 0 else np.ones(len(hits), dtype=bool)
+                hits, neighbours = order[hits[pairs]], order[neighbours[pairs]]
+                in_time = np.abs(tof[hits] - tof[neighbours]) <= self.time_window
+                first.append(hits[in_time])
+                second.append(neighbours[in_time])
+        first, second = np.concatenate(first), np.concatenate(second)
+        graph = coo_matrix((np.ones(len(first), dtype=np.int8), (first, second)),
+                           shape=(number_of_hits, number_of_hits))
+        return connected_components(graph, directed=False)[1]
+
+    def __centroids(self, labels, x, y, tof, tot, trigger_nr):
+        number_of_clusters = labels.max() + 1 if len(labels) else 0
+        clustersize = np.bincount(labels, minlength=number_of_clusters)
+        tot_sum = np.bincount(labels, weights=tot, minlength=number_of_clusters)
+        with np.errstate(invalid='ignore', divide='ignore'):  # clusters with tot = 0 only are NaN
+            centroids = {'x': np.bincount(labels, weights=x * tot, minlength=number_of_clusters) / tot_sum,
+                         'y': np.bincount(labels, weights=y * tot, minlength=number_of_clusters) / tot_sum}
+        tot_max = np.full(number_of_clusters, -np.inf)
+        np.maximum.at(tot_max, labels, tot)
+        max_hits = np.flatnonzero(tot == tot_max[labels])
+        max_hit = np.empty(number_of_clusters, dtype=np.int64)
+        max_hit[labels[max_hits]] = max_hits  # on ties the last hit with the largest tot
+        centroids['tof'] = tof[max_hit]
+        centroids['tot avg'] = tot_sum / np.maximum(clustersize, 1)
+        centroids['tot max'] = tot_max
+        centroids['clustersize'] = clustersize
+        centroids['trigger nr'] = trigger_nr[max_hit]
+        kept = np.flatnonzero(clustersize >= self.min_clustersize)
+        kept = kept[np.argsort(centroids['tof'][kept])]
+        kept = kept[np.argsort(centroids['trigger nr'][kept], kind='stable')]
+        return {parameter: values[kept] for parameter, values in centroids.items()}
+
+    def centroid_run(self, timepix_run, processes=None, chunk_size=None):
+        """
+        Returns the centroided events of *timepix_run* (TimePixRun obj) sorted by trigger nr and tof -
+        trigger aligned sections of the raw events are clustered in parallel by *processes* processes
+        """
+        sections = timepix_run.get_sections('raw', chunk_size, trigger_aligned=True)
+        if processes == 1:
+            results = [_centroid_section(self, timepix_run.hdf_file, section) for section in sections]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(_centroid_section, [self] * len(sections),
+                                            [timepix_run.hdf_file] * len(sections), sections))
+        return {parameter: np.concatenate([result[parameter] for result in results])
+                for parameter in TimePixRun.centroided_datasets}
+
+    def to_hdf(self, filename, centroids, group='centroided'):
+        """ Writes *centroids* like the centroided/ group of the Timepix files, with the clustering parameters """
+        with h5py.File(filename, 'a') as h_file:
+            if group in h_file:
+                del h_file[group]
+            h_group = h_file.create_group(group)
+            for parameter in TimePixRun.centroided_datasets:
+                h_group.create_dataset(parameter, data=centroids[parameter], chunks=True, compression='gzip')
+            h_group.attrs['nr events'] = len(centroids['trigger nr'])
+            for attribute in ('tot_threshold', 'max_distance', 'time_window', 'min_clustersize'):
+                h_group.attrs[attribute] = getattr(self, attribute)
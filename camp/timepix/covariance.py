@@ -0,0 +1,107 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from camp.utils.utils import lookup
+
+
+class CovarianceMap():
+    """
+    ToF-ToF covariance map <XY> - <X><Y> over shots, X and Y being the per-shot ToF histograms with the bin edges
+    *tof_bins*. Events are grouped by trigger nr into a sparse (shots x bins) histogram H per chunk and
+    H.T @ H is accumulated - together with a shot-wise intensity I (e.g. GMD) for the partial covariance.
+    The events of a shot have to be added at once (see TimePixRun.iter_events with trigger_aligned=True).
+    Partial maps of several chunks or runs can be merged.
+    """
+
+    def __init__(self, tof_bins):
+        self.tof_bins = np.asarray(tof_bins, dtype=float)
+        assert self.tof_bins.ndim == 1, 'tof_bins have to be an array of bin edges'
+        number_of_bins = len(self.tof_bins) - 1
+        self.number_of_shots = 0
+        self.sum_x = np.zeros(number_of_bins)
+        self.sum_xy = np.zeros((number_of_bins, number_of_bins))
+        self.sum_i = 0.0
+        self.sum_ii = 0.0
+        self.sum_xi = np.zeros(number_of_bins)
+
+    def add_shots(self, number_of_shots=None, intensities=None):
+        """ Adds shots (also the ones without events) - with the *intensities* for the partial covariance """
+        if intensities is not None:
+            intensities = np.asarray(intensities, dtype=float)
+            number_of_shots = len(intensities)
+            self.sum_i += intensities.sum()
+            self.sum_ii += np.sum(intensities ** 2)
+        self.number_of_shots += number_of_shots
+        return self
+
+    def add(self, trigger_nrs, tof, intensities=None):
+        """
+        Adds the events of complete shots - *trigger_nrs* (sorted) assigns the events to shots,
+        *intensities* is the intensity of the shot of every event
+        """
+        trigger_nrs, tof = np.asarray(trigger_nrs), np.asarray(tof, dtype=float)
+        if len(trigger_nrs) == 0:
+            return self
+        shot_index = np.concatenate(([0], np.cumsum(trigger_nrs[1:] != trigger_nrs[:-1])))
+        bin_index = np.searchsorted(self.tof_bins, tof, side='right') - 1
+        bin_index[tof == self.tof_bins[-1]] = len(self.sum_x) - 1
+        inside = np.logical_and(bin_index >= 0, bin_index < len(self.sum_x))
+        histograms = csr_matrix((np.ones(np.count_nonzero(inside)), (shot_index[inside], bin_index[inside])),
+                                shape=(shot_index[-1] + 1, len(self.sum_x)))  # duplicates are summed
+        self.sum_x += np.bincount(bin_index[inside], minlength=len(self.sum_x))
+        self.sum_xy += (histograms.T @ histograms).toarray()
+        if intensities is not None:
+            intensities = np.asarray(intensities, dtype=float)
+            self.sum_xi += np.bincount(bin_index[inside], weights=intensities[inside], minlength=len(self.sum_x))
+        return self
+
+    def merge(self, other):
+        assert np.array_equal(self.tof_bins, other.tof_bins), 'covariance maps with different bins'
+        self.number_of_shots += other.number_of_shots
+        self.sum_x += other.sum_x
+        self.sum_xy += other.sum_xy
+        self.sum_i += other.sum_i
+        self.sum_ii += other.sum_ii
+        self.sum_xi += other.sum_xi
+        return self
+
+    def mean(self):
+        return self.sum_x / self.number_of_shots
+
+    def covariance(self):
+        assert self.number_of_shots != 0, 'no shots added'
+        mean_x = self.mean()
+        return self.sum_xy / self.number_of_shots - np.outer(mean_x, mean_x)
+
+    def partial_covariance(self):
+        """ cov(X, Y) - cov(X, I) cov(I, Y) / var(I) """
+        covariance = self.covariance()
+        mean_i = self.sum_i / self.number_of_shots
+        variance_i = self.sum_ii / self.number_of_shots - mean_i ** 2
+        assert variance_i > 0, 'no intensities added or intensity is constant'
+        covariance_xi = self.sum_xi / self.number_of_shots - self.mean() * mean_i
+        return covariance - np.outer(covariance_xi, covariance_xi) / variance_i
+
+
+def covariance_map_of_run(timepix_run, event_type, tof_bins, *filter_parms, fragment=None, train_ids=None,
+                          intensities=None, chunk_size=None, shifted=True):
+    """
+    Returns the CovarianceMap of all triggers of *timepix_run* which have a trainID - with the per-train
+    *intensities* of *train_ids* (e.g. GMD of the FLASH DAQ) only the triggers with an intensity are used
+    """
+    covariance_map = CovarianceMap(tof_bins)
+    trigger_Nrs, trainIDs = timepix_run.get_trainIDs(shifted)
+    if intensities is not None:
+        trigger_intensities = lookup(train_ids, intensities, trainIDs)
+        shots = ~np.isnan(trigger_intensities)
+        trigger_Nrs, trigger_intensities = trigger_Nrs[shots], trigger_intensities[shots]
+        covariance_map.add_shots(intensities=trigger_intensities)
+    else:
+        covariance_map.add_shots(len(trigger_Nrs))
+    for timepix_dict in timepix_run.iter_events(event_type, ['tof', 'trigger nr'], *filter_parms,
+                                                fragment=fragment, chunk_size=chunk_size, trigger_aligned=True):
+        events = np.isin(timepix_dict['trigger nr'], trigger_Nrs)
+        event_intensities = None
+        if intensities is not None:
+            event_intensities = lookup(trigger_Nrs, trigger_intensities, timepix_dict['trigger nr'][events])
+        covariance_map.add(timepix_dict['trigger nr'][events], timepix_dict['tof'][events], event_intensities)
+    return covariance_map
@@ -0,0 +1,83 @@
+from pathlib import Path
+import numpy as np
+import h5py
+from camp.utils.utils import sidecar_file, file_signature
+
+
+class EventIndex:
+    """
+    Start and stop rows of every trigger nr in the raw/ and centroided/ datasets
+    of a Timepix HDF5 file. The index is built once by scanning the 'trigger nr'
+    columns and cached in a sidecar file next to the HDF5 file, which is rebuilt
+    whenever the HDF5 file changes.
+    """
+    event_types = ('raw', 'centroided')
+
+    def __init__(self, hdf_file, chunk_size=10 ** 7):
+        self.hdf_file = Path(hdf_file)
+        self.index_file = sidecar_file(self.hdf_file, 'index')
+        self.trigger_nrs, self.starts, self.stops = {}, {}, {}
+        if not self.__load():
+            self.__build(chunk_size)
+            self.__save()
+
+    def __load(self):
+        if not self.index_file.is_file():
+            return False
+        with h5py.File(self.index_file, 'r') as h_file:
+            if tuple(h_file.attrs['source signature']) != file_signature(self.hdf_file):
+                return False
+            for event_type in self.event_types:
+                self.trigger_nrs[event_type] = h_file[event_type + '/trigger nr'][:]
+                self.starts[event_type] = h_file[event_type + '/start'][:]
+                self.stops[event_type] = h_file[event_type + '/stop'][:]
+        return True
+
+    def __save(self):
+        try:
+            with h5py.File(self.index_file, 'w') as h_file:
+                h_file.attrs['source signature'] = file_signature(self.hdf_file)
+                for event_type in self.event_types:
+                    h_file[event_type + '/trigger nr'] = self.trigger_nrs[event_type]
+                    h_file[event_type + '/start'] = self.starts[event_type]
+                    h_file[event_type + '/stop'] = self.stops[event_type]
+        except OSError:
+            print('Event index could not be written to', self.index_file)
+
+    def __build(self, chunk_size):
+        with h5py.File(self.hdf_file, 'r') as h_file:
+            for event_type in self.event_types:
+                dset = h_file[event_type + '/trigger nr']
+                trigger_nrs, starts = [], []
+                last_trigger_nr = None
+                for start in range(0, dset.shape[0], chunk_size):
+                    values = dset[start:start + chunk_size]
+                    assert np.all(values[1:] >= values[:-1]), f'{event_type} events are not sorted by trigger nr'
+                    assert last_trigger_nr is None or values[0] >= last_trigger_nr, \
+                        f'{event_type} events are not sorted by trigger nr'
+                    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+                    if last_trigger_nr is None or values[0] != last_trigger_nr:
+                        changes = np.concatenate(([0], changes))
+                    trigger_nrs.append(values[changes])
+                    starts.append(changes + start)
+                    last_trigger_nr = values[-1]
+                self.trigger_nrs[event_type] = np.concatenate(trigger_nrs or [dset[0:0]])
+                self.starts[event_type] = np.concatenate(starts or [np.array([], dtype=np.int64)])
+                self.stops[event_type] = np.append(self.starts[event_type][1:], dset.shape[0])
+
+    def row_intervals(self, event_type, trigger_nrs):
+        """
+        Returns the merged (start, stop) row intervals of the events with the given trigger nrs
+        - trigger nrs without events are skipped
+        """
+        assert event_type in self.event_types, 'event type does not exist'
+        trigger_nrs = np.unique(trigger_nrs)
+        positions = np.searchsorted(self.trigger_nrs[event_type], trigger_nrs)
+        positions = positions[positions < len(self.trigger_nrs[event_type])]
+        positions = positions[np.isin(self.trigger_nrs[event_type][positions], trigger_nrs)]
+        starts, stops = self.starts[event_type][positions], self.stops[event_type][positions]
+        if len(starts) == 0:
+            return []
+        interval_starts = np.concatenate(([True], starts[1:] != stops[:-1]))
+        interval_stops = np.concatenate((interval_starts[1:], [True]))
+        return list(zip(starts[interval_starts], stops[interval_stops]))
@@ -0,0 +1,109 @@
+import numpy as np
+from camp.timepix.run import Ion
+from camp.utils.utils import lookup
+
+
+class DelayHistogram():
+    """
+    2-D histogram pump-probe delay × value (e.g. ToF or VMI radius) accumulated chunk by chunk.
+    *delay_bins* and *value_bins* are bin edges (right edge included like np.histogram2d),
+    shots counts the triggers per delay bin for the normalization. Partial histograms can be merged.
+    """
+
+    def __init__(self, delay_bins, value_bins):
+        self.delay_bins = np.asarray(delay_bins, dtype=float)
+        self.value_bins = np.asarray(value_bins, dtype=float)
+        assert self.delay_bins.ndim == 1 and self.value_bins.ndim == 1, 'bins have to be arrays of bin edges'
+        self.counts = np.zeros((len(self.delay_bins) - 1, len(self.value_bins) - 1), dtype=np.int64)
+        self.shots = np.zeros(len(self.delay_bins) - 1, dtype=np.int64)
+
+    def add(self, delays, values):
+        delay_index = self.__bin_index(delays, self.delay_bins)
+        value_index = self.__bin_index(values, self.value_bins)
+        inside = np.logical_and(delay_index >= 0, value_index >= 0)
+        counts = np.bincount(delay_index[inside] * self.counts.shape[1] + value_index[inside],
+                             minlength=self.counts.size)
+        self.counts += counts.reshape(self.counts.shape)
+        return self
+
+    def add_shots(self, delays):
+        delay_index = self.__bin_index(delays, self.delay_bins)
+        self.shots += np.bincount(delay_index[delay_index >= 0], minlength=len(self.shots))
+        return self
+
+    def merge(self, other):
+        assert np.array_equal(self.delay_bins, other.delay_bins) and np.array_equal(self.value_bins,
+                                                                                    other.value_bins), \
+            'histograms with different bins'
+        self.counts += other.counts
+        self.shots += other.shots
+        return self
+
+    def normalized(self):
+        """ Events per shot - delay bins without shots are NaN """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.counts / self.shots[:, np.newaxis]
+
+    @staticmethod
+    def __bin_index(values, bin_edges):
+        """ Index of the bin of each value, -1 outside of the bin edges (and for NaN) """
+        values = np.asarray(values, dtype=float)
+        bin_index = np.searchsorted(bin_edges, values, side='right') - 1
+        bin_index[values == bin_edges[-1]] = len(bin_edges) - 2
+        bin_index[np.logical_or(bin_index >= len(bin_edges) - 1, np.isnan(values))] = -1
+        return bin_index
+
+
+class PumpProbeRun():
+    """
+    Joins the events of a TimePixRun via 'trigger nr' -> trainID -> delay to a per-train delay array
+    (*train_ids*, *delays*, e.g. from the FLASH DAQ) and bins them into delay × ToF / delay × radius
+    histograms in one streaming pass over the events.
+    """
+
+    def __init__(self, timepix_run, train_ids, delays, shifted=True):
+        assert len(train_ids) != 0, 'no delays given'
+        self.timepix_run = timepix_run
+        trigger_Nrs, trainIDs = timepix_run.get_trainIDs(shifted)
+        self.trigger_Nrs = trigger_Nrs  # ascending, see TimePixRun.get_trainIDs
+        self.trigger_delays = lookup(train_ids, delays, trainIDs)
+
+    @classmethod
+    def from_pp_delay(cls, timepix_run, shifted=True):
+        """ All trains of the run with the pump-probe delay of pp_delay.yaml """
+        pp_delay = timepix_run.get_pp_delay()
+        trigger_Nrs, trainIDs = timepix_run.get_trainIDs(shifted)
+        return cls(timepix_run, trainIDs, np.full(len(trainIDs), np.nan if pp_delay is None else pp_delay),
+                   shifted=shifted)
+
+    def delays_of_triggers(self, trigger_nrs):
+        """ Delay of every trigger nr - NaN if the trigger has no trainID or the train no delay """
+        return lookup(self.trigger_Nrs, self.trigger_delays, trigger_nrs)
+
+    def delay_tof_histogram(self, event_type, delay_bins, tof_bins, *filter_parms, fragment=None,
+                            chunk_size=None):
+        return self.__histogram(event_type, ['tof'], lambda columns: columns['tof'], delay_bins, tof_bins,
+                                filter_parms, fragment, chunk_size)
+
+    def delay_radius_histogram(self, event_type, delay_bins, radius_bins, *filter_parms, center=None,
+                               fragment=None, chunk_size=None):
+        """ VMI radius around *center* (x, y) - by default around center_x, center_y of *fragment* """
+        if center is None:
+            assert fragment is not None, 'center or fragment required'
+            ion = Ion(self.timepix_run.fragments_config_file, fragment)
+            center = (ion.center_x, ion.center_y)
+
+        def radius(columns):
+            return np.hypot(columns['x'] - center[0], columns['y'] - center[1])
+
+        return self.__histogram(event_type, ['x', 'y'], radius, delay_bins, radius_bins, filter_parms, fragment,
+                                chunk_size)
+
+    def __histogram(self, event_type, parameters, value_function, delay_bins, value_bins, filter_parms, fragment,
+                    chunk_size):
+        delay_histogram = DelayHistogram(delay_bins, value_bins)
+        delay_histogram.add_shots(self.trigger_delays)
+        for timepix_dict in self.timepix_run.iter_events(event_type, parameters + ['trigger nr'], *filter_parms,
+                                                         fragment=fragment, chunk_size=chunk_size):
+            delay_histogram.add(self.delays_of_triggers(timepix_dict['trigger nr']), value_function(timepix_dict))
+        return delay_histogram
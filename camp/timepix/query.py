@@ -0,0 +1,100 @@
+from typing import NamedTuple
+import numpy as np
+
+
+class ChunkColumns(dict):
+    """ Columns of one chunk - read by *read_column(parameter)* on first access and reused afterwards """
+
+    def __init__(self, read_column):
+        super().__init__()
+        self.read_column = read_column
+
+    def __missing__(self, parameter):
+        self[parameter] = self.read_column(parameter)
+        return self[parameter]
+
+
+class Range(NamedTuple):
+    '''start <= parameter <= end - start < parameter < end if not inclusive (fragment windows)'''
+    parameter: str
+    start: float
+    end: float
+    inclusive: bool = True
+
+    def parameters(self):
+        return {self.parameter}
+
+    def select(self, columns, rows):
+        """ Returns the *rows* (indices within the chunk) which satisfy the range """
+        values = columns[self.parameter][rows]
+        if self.inclusive:
+            return rows[np.logical_and(values >= self.start, values <= self.end)]
+        return rows[np.logical_and(values > self.start, values < self.end)]
+
+
+class _Combination():
+    """
+    Combination of predicates which are evaluated one after another on the remaining rows only.
+    The order is chosen before every step from the number of columns a predicate still has to read
+    and the pass rate observed in the previous evaluations (adaptive, starting at 0.5).
+    """
+
+    def __init__(self, *predicates):
+        assert len(predicates) != 0, 'no predicates'
+        self.predicates = list(predicates)
+        self.evaluated_rows = np.zeros(len(predicates))
+        self.passed_rows = np.zeros(len(predicates))
+
+    def parameters(self):
+        return set().union(*[predicate.parameters() for predicate in self.predicates])
+
+    def _evaluate(self, index, columns, rows):
+        selected_rows = self.predicates[index].select(columns, rows)
+        self.evaluated_rows[index] += len(rows)
+        self.passed_rows[index] += len(selected_rows)
+        return selected_rows
+
+    def _next(self, remaining, columns, prefer_selective):
+        pass_rates = (self.passed_rows + 1) / (self.evaluated_rows + 2)
+        gains = 1 - pass_rates if prefer_selective else pass_rates
+        costs = [0.1 + sum(parameter not in columns for parameter in self.predicates[index].parameters())
+                 for index in remaining]
+        return remaining[int(np.argmin([cost / max(gains[index], 1e-6)
+                                        for cost, index in zip(costs, remaining)]))]
+
+
+class And(_Combination):
+
+    def select(self, columns, rows):
+        remaining = list(range(len(self.predicates)))
+        while remaining and len(rows) != 0:
+            index = self._next(remaining, columns, prefer_selective=True)
+            remaining.remove(index)
+            rows = self._evaluate(index, columns, rows)
+        return rows
+
+
+class Or(_Combination):
+
+    def select(self, columns, rows):
+        remaining = list(range(len(self.predicates)))
+        selected_rows = []
+        while remaining and len(rows) != 0:
+            index = self._next(remaining, columns, prefer_selective=False)
+            remaining.remove(index)
+            passed_rows = self._evaluate(index, columns, rows)
+            selected_rows.append(passed_rows)
+            rows = rows[~np.isin(rows, passed_rows, assume_unique=True)]
+        return np.sort(np.concatenate(selected_rows)) if selected_rows else rows
+
+
+def fragment_window(ion):
+    """ Predicate of the x, y, tof window of *ion* (Ion obj) - borders excluded """
+    return And(Range('tof', ion.tof_start, ion.tof_end, inclusive=False),
+               Range('x', ion.start_x, ion.end_x, inclusive=False),
+               Range('y', ion.start_y, ion.end_y, inclusive=False))
+
+
+def select_rows(predicate, columns, number_of_rows):
+    """ Returns the indices of the rows of a chunk with *number_of_rows* rows which satisfy *predicate* """
+    return predicate.select(columns, np.arange(number_of_rows))
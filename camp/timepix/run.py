@@ -4,9 +4,10 @@ import glob
 from typing import NamedTuple
 import numpy as np
 import h5py
-import yaml
 import camp
-from camp.utils.utils import find_nearest, check_for_completeness
+from camp.utils.utils import find_nearest, check_for_completeness, load_yaml
+from camp.timepix.event_index import EventIndex
+from camp.timepix.query import ChunkColumns, Range, And, fragment_window, select_rows
 
 
 class Ion:
@@ -14,8 +15,7 @@ class Ion:
     def __init__(self, fragments_config_file: str, fragment_name: str):
         experimental_set, fragment = fragment_name.split(',')
         print(experimental_set, fragment)
-        with open(fragments_config_file, 'r') as ymlfile:
-            cfg = yaml.safe_load(ymlfile)
+        cfg = load_yaml(fragments_config_file)
         self.tof_start = cfg[experimental_set][fragment]['tof_start']
         self.tof_end = cfg[experimental_set][fragment]['tof_end']
         self.center_x = cfg[experimental_set][fragment]['center_x']
@@ -37,13 +37,23 @@ class TimePixRun:
     file_system = 'core'
     raw_datasets = ['x', 'y', 'tof', 'tot', 'trigger nr']
     centroided_datasets = ['x', 'y', 'tof', 'tot avg', 'tot max', 'clustersize', 'trigger nr']
+    chunk_size = 10 ** 7  # number of events per chunk in iter_events
 
-    def __init__(self, run_number: int):
+    def __init__(self, run_number: int, catalog=None, column_cache=None):
+        """
+        *catalog* (RunCatalog obj) caches the file resolution and metadata of runs on disk,
+        *column_cache* (ColumnCache obj) caches the decompressed datasets as memory-mapped files
+        """
         assert isinstance(run_number, int)
         self.run_number = run_number
+        self.catalog = catalog
+        self.column_cache = column_cache
         self.__generate_config_file_path()
-        self.__generate_hdf_filename()
-        self.__fetch_attributes()
+        if catalog is None or not catalog.restore(self):
+            self.__generate_hdf_filename()
+            self.__fetch_attributes()
+            if catalog is not None:
+                catalog.store(self)
 
     def __generate_config_file_path(self):
         self.config_data_path_file = Path(os.path.join(os.path.dirname(camp.__file__), '../config/beamtime.yaml'))
@@ -51,8 +61,7 @@ class TimePixRun:
         self.run_number_config_file = Path(os.path.join(os.path.dirname(camp.__file__), '../config/run_numbers.yaml'))
 
     def __generate_hdf_filename(self):
-        with open(self.config_data_path_file, 'r') as ymlfile:
-            cfg = yaml.safe_load(ymlfile)
+        cfg = load_yaml(self.config_data_path_file)
         timepix_hdf_path = cfg['path'][self.file_system] + cfg['timepix']
         try:
             file_list = glob.glob(f'{timepix_hdf_path}run_{self.run_number:04d}_*.hdf5')
@@ -74,28 +83,34 @@ class TimePixRun:
         """
         Obsolte when synchronized with FLASH DAQ
         """
-        with open(self.config_data_path_file, 'r') as ymlfile:
-            cfg = yaml.safe_load(ymlfile)
+        cfg = load_yaml(self.config_data_path_file)
         pp_delay_path = cfg['path'][self.file_system] + cfg['pp_delay']
         assert os.path.isfile(pp_delay_path), 'File does not exist!'
-        try:
-            with open(pp_delay_path, 'r') as ymlfile:
-                yml = yaml.safe_load(ymlfile)
-            self.pp_delay = yml['pp_delay'][self.run_number]
-            return self.pp_delay
-        except KeyError:
+        found, self.pp_delay = self.__get_catalog_value('pp_delay', pp_delay_path)
+        if not found:
+            self.pp_delay = load_yaml(pp_delay_path)['pp_delay'].get(self.run_number)
+            self.__set_catalog_value('pp_delay', self.pp_delay, pp_delay_path)
+        if self.pp_delay is None:
             print("Run", self.run_number, "does not have pump-probe delay.")
-            return None
+        return self.pp_delay
 
     def get_flash_run_number(self):
-        try:
-            with open(self.run_number_config_file, 'r') as ymlfile:
-                cfg = yaml.safe_load(ymlfile)
-            self.flash_run_number = cfg[self.run_number]
-            return self.flash_run_number
-        except KeyError:
+        found, self.flash_run_number = self.__get_catalog_value('flash_run_number', self.run_number_config_file)
+        if not found:
+            self.flash_run_number = load_yaml(self.run_number_config_file).get(self.run_number)
+            self.__set_catalog_value('flash_run_number', self.flash_run_number, self.run_number_config_file)
+        if self.flash_run_number is None:
             print("Run", self.run_number, "does not have a corresponding FLASH DAQ run number.")
-            return None
+        return self.flash_run_number
+
+    def __get_catalog_value(self, key, source_file):
+        if self.catalog is None:
+            return False, None
+        return self.catalog.get_value(self, key, source_file)
+
+    def __set_catalog_value(self, key, value, source_file):
+        if self.catalog is not None:
+            self.catalog.set_value(self, key, value, source_file)
 
     def get_trainIDs(self, shifted=True):
         with h5py.File(self.hdf_file, 'r') as h_file:
@@ -105,35 +120,113 @@ class TimePixRun:
             tpx3_timestamps = h_file['timing/timepix/timestamp'][:]
         assert len(x2_trainIDs) == len(x2_timestamps), 'unmatching length'
         assert len(tpx3_triggerNrs) == len(tpx3_timestamps), 'unmatching length'
-        assert len(np.unique(x2_trainIDs)) == len(x2_trainIDs), 'found duplicates'
-        assert len(np.unique(x2_timestamps)) == len(x2_timestamps), 'found duplicates'
-        assert len(np.unique(tpx3_triggerNrs)) == len(tpx3_triggerNrs), 'found duplicates'
-        assert len(np.unique(tpx3_timestamps)) == len(tpx3_timestamps), 'found duplicates'
+        for values in (x2_trainIDs, x2_timestamps, tpx3_triggerNrs, tpx3_timestamps):
+            assert np.all(values[1:] > values[:-1]), 'found duplicates or unsorted values'
         start_index = find_nearest(x2_timestamps, tpx3_timestamps[0])
         assert not (check_for_completeness(x2_trainIDs[start_index:])), 'list of trainIDs is not continuous'
-        trainIDs = [x2_trainIDs[start_index]]
-        trigger_Nrs = [tpx3_triggerNrs[0]]
-        skip = 1
-        for i in range(len(tpx3_triggerNrs) - 1):
-            if (tpx3_triggerNrs[i + 1] - tpx3_triggerNrs[i]) == 2:
-                skip += 1
-            try:
-                trainIDs.append(x2_trainIDs[start_index + i + skip])
-                trigger_Nrs.append(tpx3_triggerNrs[i + 1])
-            except IndexError:
-                pass
-        assert len(trainIDs) == len(trigger_Nrs), 'matching fails'
-        trigger_Nrs, trainIDs = np.array(trigger_Nrs), np.array(trainIDs)
+        # a trigger nr step of 2 means that the Timepix missed one train - all following trains are shifted by one
+        skips = np.concatenate(([0], np.cumsum(np.diff(tpx3_triggerNrs) == 2)))
+        trainID_indices = start_index + np.arange(len(tpx3_triggerNrs)) + skips
+        matched = trainID_indices < len(x2_trainIDs)
+        trigger_Nrs, trainIDs = tpx3_triggerNrs[matched], x2_trainIDs[trainID_indices[matched]]
         if shifted == True and ~np.isnan(self.trainID_shift):
             trainIDs = trainIDs + self.trainID_shift
         return trigger_Nrs, trainIDs
 
+    def get_event_index(self):
+        """ Returns the trigger nr -> event rows index of the run, built once and cached in a sidecar file """
+        if getattr(self, 'event_index', None) is None:
+            self.event_index = EventIndex(self.hdf_file)
+        return self.event_index
+
+    def get_events_for_trains(self, train_ids, event_type, parameters, shifted=True):
+        """
+        Returns the events of the given trainIDs, reading only the rows of the
+        corresponding triggers instead of scanning the whole 'trigger nr' column
+        """
+        self.__assert_event_request(event_type, parameters, (), None)
+        trigger_Nrs, trainIDs = self.get_trainIDs(shifted)
+        row_intervals = self.get_event_index().row_intervals(event_type, trigger_Nrs[np.isin(trainIDs, train_ids)])
+        timepix_dict = {}
+        with h5py.File(self.hdf_file, 'r') as h_file:
+            for parameter in parameters:
+                dset = self.__dataset(h_file, str(event_type) + '/' + str(parameter))
+                sections = [dset[start:stop] for start, stop in row_intervals]
+                timepix_dict[parameter] = np.concatenate(sections) if sections else dset[0:0]
+        return timepix_dict
+
     def get_hdf_dataset(self, hdf_dataset_name):
         with h5py.File(self.hdf_file, 'r') as h_file:
-            values = h_file[str(hdf_dataset_name)][:]
+            values = self.__dataset(h_file, str(hdf_dataset_name))[:]
         return values
 
     def get_events(self, event_type, parameters, *filter_parms, fragment=None):
+        """
+        Returns the events as dict of arrays - *filter_parms* (Filter obj or predicates of camp.timepix.query)
+        and *fragment* are combined, see iter_events
+        """
+        timepix_dict = {parameter: [] for parameter in parameters}
+        for chunk in self.__select_events(event_type, parameters, filter_parms, fragment, None, False):
+            for parameter in parameters:
+                timepix_dict[parameter].append(chunk[parameter])
+        for parameter in parameters:
+            if timepix_dict[parameter]:
+                timepix_dict[parameter] = np.concatenate(timepix_dict[parameter])
+            else:  # no events at all
+                timepix_dict[parameter] = self.get_hdf_dataset(str(event_type) + '/' + str(parameter))
+        return timepix_dict
+
+    def iter_events(self, event_type, parameters, *filter_parms, fragment=None, chunk_size=None,
+                    trigger_aligned=False):
+        """
+        Generator version of get_events - yields the filtered events chunk by chunk
+        as dicts, so that the memory usage is bounded by *chunk_size* instead of the run size.
+        The chunk size is rounded up to a multiple of the HDF5 chunk size of the datasets.
+        With *trigger_aligned* the chunks end at trigger nr boundaries (via the EventIndex),
+        so that all events of a shot are in the same chunk.
+        """
+        for timepix_dict in self.__select_events(event_type, parameters, filter_parms, fragment, chunk_size,
+                                                 trigger_aligned):
+            if len(timepix_dict) != 0 and len(next(iter(timepix_dict.values()))) == 0:
+                continue
+            yield timepix_dict
+
+    def __select_events(self, event_type, parameters, filter_parms, fragment, chunk_size, trigger_aligned):
+        """
+        Yields the selected events of every chunk. The filters and the fragment window are combined into one
+        query (camp.timepix.query) - every column is read at most once per chunk, the predicates are evaluated
+        on the remaining rows only and the *parameters* are gathered for the selected rows at the end.
+        """
+        self.__assert_event_request(event_type, parameters, filter_parms, fragment)
+        query = self.__create_query(filter_parms, fragment)
+        for columns, number_of_rows in self.__iter_columns(event_type, chunk_size, trigger_aligned):
+            if query is None:
+                yield {parameter: columns[parameter] for parameter in parameters}
+                continue
+            rows = select_rows(query, columns, number_of_rows)
+            if len(rows) == number_of_rows:
+                yield {parameter: columns[parameter] for parameter in parameters}
+            else:
+                yield {parameter: columns[parameter][rows] for parameter in parameters}
+
+    def __iter_columns(self, event_type, chunk_size, trigger_aligned=False):
+        """ Yields (columns, number of rows) of every chunk of *event_type* events - columns are read on access """
+        with h5py.File(self.hdf_file, 'r') as h_file:
+            dset = h_file[str(event_type) + '/trigger nr']
+            for selection in self.__sections(dset, event_type, chunk_size, trigger_aligned):
+                yield ChunkColumns(lambda parameter, selection=selection: self.__dataset(
+                    h_file, str(event_type) + '/' + str(parameter))[selection]), selection.stop - selection.start
+
+    def __create_query(self, filter_parms, fragment):
+        predicates = [Range(filter_parm.parameter, filter_parm.start, filter_parm.end)
+                      if isinstance(filter_parm, Filter) else filter_parm for filter_parm in filter_parms]
+        if fragment is not None:
+            predicates.append(fragment_window(Ion(self.fragments_config_file, fragment)))
+        if not predicates:
+            return None
+        return predicates[0] if len(predicates) == 1 else And(*predicates)
+
+    def __assert_event_request(self, event_type, parameters, filter_parms, fragment):
         assert event_type in ('raw', 'centroided'), 'event type does not exist'
         if event_type == 'raw':
             assert all(elem in self.raw_datasets for elem in parameters), \
@@ -141,51 +234,87 @@ class TimePixRun:
         if event_type == 'centroided':
             assert all(elem in self.centroided_datasets for elem in parameters), \
                 'parameters do not exist in chosen event type'
-        if filter_parms and fragment:
-            raise Exception('chosing filter parameters and fragments is too ambitious')
+        for filter_parm in filter_parms:
+            if not isinstance(filter_parm, Filter):
+                assert hasattr(filter_parm, 'select') and hasattr(filter_parm, 'parameters'), \
+                    'filter parameter is neither a Filter obj nor a predicate'
+                datasets = self.raw_datasets if event_type == 'raw' else self.centroided_datasets
+                assert filter_parm.parameters() <= set(datasets), 'chosen filter parameter does not exist'
+                continue
+            if event_type == 'raw':
+                assert filter_parm.parameter in self.raw_datasets, \
+                    'chosen filter parameter does not exist'
+            if event_type == 'centroided':
+                assert filter_parm.parameter in self.centroided_datasets, \
+                    'chosen filter parameter does not exist'
+            assert type(filter_parm.start) in [int, float], \
+                'start value of filter is not a number'
+            assert type(filter_parm.end) in [int, float], \
+                'end value of filter is not a number'
 
-        timepix_dict = {}
-        logical_map = None
+    def get_fragments(self, event_type, parameters, fragments, chunk_size=None):
+        """
+        Returns a dict {fragment: timepix_dict} for several fragments (e.g. ['fragments,I+', 'fragments,I2+']).
+        x, y, tof and the *parameters* are read once per chunk and all fragment windows are evaluated in one pass.
+        """
+        self.__assert_event_request(event_type, parameters, (), None)
+        windows = [fragment_window(Ion(self.fragments_config_file, fragment)) for fragment in fragments]
+        sections = {fragment: {parameter: [] for parameter in parameters} for fragment in fragments}
+        for columns, number_of_rows in self.__iter_columns(event_type, chunk_size):
+            for fragment, window in zip(fragments, windows):
+                rows = select_rows(window, columns, number_of_rows)
+                for parameter in parameters:
+                    sections[fragment][parameter].append(columns[parameter][rows])
+        return {fragment: {parameter: np.concatenate(sections[fragment][parameter])
+                           if sections[fragment][parameter]
+                           else self.get_hdf_dataset(str(event_type) + '/' + str(parameter))  # no events at all
+                           for parameter in parameters}
+                for fragment in fragments}
+
+    def get_fragment_labels(self, event_type, fragments, chunk_size=None):
+        """
+        Returns the index of the fragment in *fragments* for every event, -1 if an event belongs to none.
+        Events within overlapping fragment windows are labeled with the first matching fragment.
+        """
+        assert len(fragments) < 2 ** 15, 'too many fragments'
+        self.__assert_event_request(event_type, [], (), None)
+        windows = [fragment_window(Ion(self.fragments_config_file, fragment)) for fragment in fragments]
+        labels = []
+        for columns, number_of_rows in self.__iter_columns(event_type, chunk_size):
+            chunk_labels = np.full(number_of_rows, -1, dtype=np.int16)
+            rows = np.arange(number_of_rows)
+            for index, window in enumerate(windows):  # only the unlabeled events are evaluated
+                selected_rows = window.select(columns, rows)
+                chunk_labels[selected_rows] = index
+                rows = rows[chunk_labels[rows] == -1]
+            labels.append(chunk_labels)
+        return np.concatenate(labels) if labels else np.array([], dtype=np.int16)
+
+    def get_sections(self, event_type, chunk_size=None, trigger_aligned=False):
+        """
+        Returns the row slices of the chunks of *event_type* events - the chunk size is rounded up
+        to a multiple of the HDF5 chunk size and with *trigger_aligned* every chunk starts at a trigger nr
+        """
         with h5py.File(self.hdf_file, 'r') as h_file:
-            for parameter in parameters:
-                timepix_dict[parameter] = h_file[str(str(event_type) + '/' + str(parameter))][:]
-
-            if filter_parms:
-                for filter_parm in filter_parms:
-                    assert isinstance(filter_parm, Filter), \
-                        'filter parameter is not instance of Filter obj'
-                    if event_type == 'raw':
-                        assert filter_parm.parameter in self.raw_datasets, \
-                            'chosen filter parameter does not exist'
-                    if event_type == 'centroided':
-                        assert filter_parm.parameter in self.centroided_datasets, \
-                            'chosen filter parameter does not exist'
-                    assert type(filter_parm.start) in [int, float], \
-                        'start value of filter is not a number'
-                    assert type(filter_parm.end) in [int, float], \
-                        'end value of filter is not a number'
-
-                for filter_parm in filter_parms:
-                    filter_parm_values = h_file[str(event_type) + '/' + str(filter_parm.parameter)][:]
-                    logical_map_section = np.logical_and(filter_parm_values >= filter_parm.start,
-                                                         filter_parm_values <= filter_parm.end)
-                    if logical_map is None:
-                        logical_map = logical_map_section
-                    else:
-                        logical_map = np.logical_and(logical_map, logical_map_section)
-
-            if fragment is not None:
-                fragment = Ion(self.fragments_config_file, fragment)
-                x = h_file[str(event_type) + '/x'][:]
-                y = h_file[str(event_type) + '/y'][:]
-                tof = h_file[str(event_type) + '/tof'][:]
-                x_logical_map = np.logical_and(x > fragment.start_x, x < fragment.end_x)
-                y_logical_map = np.logical_and(y > fragment.start_y, y < fragment.end_y)
-                tof_logical_map = np.logical_and(tof > fragment.tof_start, tof < fragment.tof_end)
-                logical_map = np.logical_and.reduce((x_logical_map, y_logical_map, tof_logical_map))
-
-        if logical_map is not None:
-            for key in timepix_dict:
-                timepix_dict[key] = timepix_dict[key][logical_map]
+            return self.__sections(h_file[str(event_type) + '/trigger nr'], event_type, chunk_size, trigger_aligned)
 
-        return timepix_dict
+    def __sections(self, dset, event_type, chunk_size, trigger_aligned):
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        assert isinstance(chunk_size, int) and chunk_size > 0, 'chunk size has to be a positive integer'
+        number_of_events = dset.shape[0]
+        if dset.chunks is not None and self.column_cache is None:
+            chunk_size = -(-chunk_size // dset.chunks[0]) * dset.chunks[0]
+        chunk_starts = np.arange(0, number_of_events, chunk_size)
+        if trigger_aligned:  # every chunk start is moved to the start of the next trigger nr
+            trigger_starts = np.append(self.get_event_index().starts[str(event_type)], number_of_events)
+            chunk_starts = np.unique(trigger_starts[np.searchsorted(trigger_starts, chunk_starts)])
+            chunk_starts = chunk_starts[chunk_starts < number_of_events]
+        return [slice(int(start), int(stop))
+                for start, stop in zip(chunk_starts, np.append(chunk_starts[1:], number_of_events))]
+
+    def __dataset(self, h_file, dataset_name):
+        """ Returns the h5py dataset or - if a column cache is set - its memory-mapped copy """
+        if self.column_cache is None:
+            return h_file[dataset_name]
+        return self.column_cache.get(h_file, dataset_name)
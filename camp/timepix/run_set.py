@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from camp.timepix.run import TimePixRun
+from camp.timepix.vmi import VmiAccumulator
+
+
+def _histogram_of_run(timepix_run, event_type, parameters, bins, filter_parms, fragment, chunk_size):
+    counts = np.zeros([len(edges) - 1 for edges in bins])
+    for timepix_dict in timepix_run.iter_events(event_type, parameters, *filter_parms,
+                                                fragment=fragment, chunk_size=chunk_size):
+        sample = [timepix_dict[parameter] for parameter in parameters]
+        counts += np.histogramdd(sample, bins=bins)[0]
+    return counts
+
+
+def _vmi_image_of_run(timepix_run, event_type, filter_parms, fragment, chunk_size):
+    vmi_accumulator = VmiAccumulator()
+    for timepix_dict in timepix_run.iter_events(event_type, ['x', 'y'], *filter_parms,
+                                                fragment=fragment, chunk_size=chunk_size):
+        vmi_accumulator.add(timepix_dict['x'], timepix_dict['y'])
+    return vmi_accumulator
+
+
+class TimePixRunSet:
+    """
+    Set of Timepix runs (e.g. all runs of one pump-probe delay) which are combined into common histograms.
+    Every run is histogrammed chunk by chunk in a separate process and the partial histograms are summed,
+    so the memory usage scales with the histogram size and not with the number of events.
+    """
+
+    def __init__(self, run_numbers, catalog=None):
+        self.run_numbers = list(run_numbers)
+        self.runs = [TimePixRun(run_number, catalog=catalog) for run_number in self.run_numbers]
+        if catalog is not None:
+            catalog.save()
+        for timepix_run in self.runs:
+            timepix_run.catalog = None  # not needed in the worker processes
+
+    def histogram(self, event_type, parameters, bins, *filter_parms, fragment=None, processes=None, chunk_size=None):
+        """
+        Returns the histogram (np.histogramdd) of *parameters* summed over all runs.
+        *bins* is a list with the bin edges of each parameter - *processes* = 1 runs in the current process
+        """
+        bins = [np.asarray(edges) for edges in bins]
+        assert len(bins) == len(parameters), 'one array of bin edges per parameter required'
+        assert all(edges.ndim == 1 for edges in bins), 'bins have to be arrays of bin edges'
+        counts = np.zeros([len(edges) - 1 for edges in bins])
+        for partial_counts in self.__map_runs(_histogram_of_run, processes, event_type, parameters, bins,
+                                              filter_parms, fragment, chunk_size):
+            counts += partial_counts
+        return counts
+
+    def tof_histogram(self, event_type, bins, *filter_parms, fragment=None, processes=None, chunk_size=None):
+        """ Returns the ToF histogram and the bin edges - *bins* are the ToF bin edges in seconds """
+        counts = self.histogram(event_type, ['tof'], [bins], *filter_parms, fragment=fragment,
+                                processes=processes, chunk_size=chunk_size)
+        return counts, np.asarray(bins)
+
+    def vmi_image(self, event_type, *filter_parms, fragment=None, processes=None, chunk_size=None):
+        """ Returns the summed VMI image with the orientation of VmiImage.image (y = 1st, x = 2nd dimension) """
+        vmi_accumulator = VmiAccumulator()
+        for partial_accumulator in self.__map_runs(_vmi_image_of_run, processes, event_type, filter_parms,
+                                                   fragment, chunk_size):
+            vmi_accumulator.merge(partial_accumulator)
+        return vmi_accumulator.image.astype(float)
+
+    def __map_runs(self, function, processes, *arguments):
+        """ Yields function(timepix_run, *arguments) of all runs - *processes* = 1 runs in the current process """
+        if processes == 1:
+            for timepix_run in self.runs:
+                yield function(timepix_run, *arguments)
+            return
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(function, timepix_run, *arguments) for timepix_run in self.runs]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,132 @@
+import os
+import glob
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import h5py
+import camp
+from camp.utils.utils import sidecar_file, file_signature, load_yaml
+from camp.timepix.run import TimePixRun
+from camp.timepix.vmi import VmiAccumulator
+
+
+class RunSummary:
+    """
+    Standard histograms of a Timepix run - ToF spectrum, VMI image and ToF vs x / y maps of the raw and
+    centroided events - computed in one chunked pass per event type. The summary is stored in the sidecar
+    file <hdf_file>.summary.h5 and rebuilt whenever the HDF5 file or the ToF binning changes.
+    """
+    event_types = ('raw', 'centroided')
+    histogram_names = ('tof', 'vmi', 'tof_vs_x', 'tof_vs_y')
+    bin_space = VmiAccumulator.bin_space
+
+    def __init__(self, tof_bins=None):
+        """ *tof_bins* are the ToF bin edges in seconds - default: 6000 bins from 0 to 20 µs """
+        if tof_bins is None:
+            tof_bins = np.linspace(0, 2e-5, 6001)
+        self.tof_bins = np.asarray(tof_bins, dtype=float)
+        assert self.tof_bins.ndim == 1, 'tof_bins have to be an array of bin edges'
+        number_of_tof_bins = len(self.tof_bins) - 1
+        self.histograms = {event_type: {'tof': np.zeros(number_of_tof_bins, dtype=np.int64),
+                                        'vmi': np.zeros((self.bin_space, self.bin_space), dtype=np.int64),
+                                        'tof_vs_x': np.zeros((number_of_tof_bins, self.bin_space), dtype=np.int64),
+                                        'tof_vs_y': np.zeros((number_of_tof_bins, self.bin_space), dtype=np.int64)}
+                           for event_type in self.event_types}
+
+    def add(self, event_type, x, y, tof):
+        histograms = self.histograms[event_type]
+        tof = np.asarray(tof, dtype=float)
+        tof_index = np.searchsorted(self.tof_bins, tof, side='right') - 1
+        tof_index[tof == self.tof_bins[-1]] = len(self.tof_bins) - 2  # right edge included like np.histogram
+        tof_inside = np.logical_and(tof_index >= 0, tof_index < len(self.tof_bins) - 1)
+        histograms['tof'] += np.bincount(tof_index[tof_inside], minlength=len(histograms['tof']))
+        histograms['vmi'] += VmiAccumulator().add(x, y).image
+        for name, dim in (('tof_vs_x', x), ('tof_vs_y', y)):
+            dim = np.asarray(dim)
+            inside = np.logical_and.reduce((tof_inside, dim >= 0, dim <= self.bin_space))
+            dim_index = np.minimum(dim[inside].astype(np.int64), self.bin_space - 1)
+            counts = np.bincount(tof_index[inside] * self.bin_space + dim_index, minlength=histograms[name].size)
+            histograms[name] += counts.reshape(histograms[name].shape)
+        return self
+
+    @classmethod
+    def build(cls, timepix_run, tof_bins=None, chunk_size=None):
+        """ Computes the summary of *timepix_run* (TimePixRun obj) - x, y, tof are read once per chunk """
+        run_summary = cls(tof_bins)
+        for event_type in cls.event_types:
+            for timepix_dict in timepix_run.iter_events(event_type, ['x', 'y', 'tof'], chunk_size=chunk_size):
+                run_summary.add(event_type, timepix_dict['x'], timepix_dict['y'], timepix_dict['tof'])
+        return run_summary
+
+    @classmethod
+    def of_run(cls, timepix_run, tof_bins=None, chunk_size=None, rebuild=False):
+        """ Loads the summary of *timepix_run* from its sidecar file - builds and stores it if missing or outdated """
+        summary_file = sidecar_file(timepix_run.hdf_file, 'summary')
+        run_summary = None if rebuild else cls.load(summary_file, timepix_run.hdf_file, tof_bins)
+        if run_summary is None:
+            run_summary = cls.build(timepix_run, tof_bins, chunk_size)
+            run_summary.save(summary_file, timepix_run.hdf_file)
+        return run_summary
+
+    @classmethod
+    def load(cls, summary_file, hdf_file, tof_bins=None):
+        """ Returns the stored summary - None if missing, outdated or with other *tof_bins* """
+        if not Path(summary_file).is_file():
+            return None
+        with h5py.File(summary_file, 'r') as h_file:
+            if tuple(h_file.attrs['source signature']) != file_signature(hdf_file):
+                return None
+            if tof_bins is not None and not np.array_equal(h_file['tof_bins'][:], np.asarray(tof_bins, dtype=float)):
+                return None
+            run_summary = cls(h_file['tof_bins'][:])
+            for event_type in cls.event_types:
+                for name in cls.histogram_names:
+                    run_summary.histograms[event_type][name] = h_file[event_type + '/' + name][:]
+        return run_summary
+
+    def save(self, summary_file, hdf_file):
+        try:
+            with h5py.File(summary_file, 'w') as h_file:
+                h_file.attrs['source signature'] = file_signature(hdf_file)
+                h_file['tof_bins'] = self.tof_bins
+                for event_type in self.event_types:
+                    for name in self.histogram_names:
+                        h_file.create_dataset(event_type + '/' + name, data=self.histograms[event_type][name],
+                                              compression='gzip')
+        except OSError:
+            print('Run summary could not be written to', summary_file)
+
+
+def _summary_of_run(timepix_run, tof_bins, chunk_size, rebuild):
+    return RunSummary.of_run(timepix_run, tof_bins, chunk_size, rebuild)
+
+
+def beamtime_run_numbers(file_system=TimePixRun.file_system):
+    """ Returns the run numbers of all Timepix HDF5 files in the timepix directory of beamtime.yaml """
+    cfg = load_yaml(Path(os.path.join(os.path.dirname(camp.__file__), '../config/beamtime.yaml')))
+    timepix_hdf_path = cfg['path'][file_system] + cfg['timepix']
+    run_numbers = [re.match(r'run_(\d+)_', os.path.basename(filename))
+                   for filename in glob.glob(f'{timepix_hdf_path}run_*_*.hdf5')]
+    return sorted(int(match.group(1)) for match in run_numbers if match)
+
+
+def build_summaries(run_numbers=None, tof_bins=None, processes=None, catalog=None, chunk_size=None, rebuild=False):
+    """
+    Builds the missing or outdated summaries of *run_numbers* (default: all runs of the beamtime) in parallel
+    and returns them as dict {run_number: RunSummary} - *processes* = 1 runs in the current process
+    """
+    if run_numbers is None:
+        run_numbers = beamtime_run_numbers()
+    timepix_runs = [TimePixRun(run_number, catalog=catalog) for run_number in run_numbers]
+    if catalog is not None:
+        catalog.save()
+    for timepix_run in timepix_runs:
+        timepix_run.catalog = None  # not needed in the worker processes
+    arguments = ([tof_bins] * len(timepix_runs), [chunk_size] * len(timepix_runs), [rebuild] * len(timepix_runs))
+    if processes == 1:
+        run_summaries = list(map(_summary_of_run, timepix_runs, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            run_summaries = list(executor.map(_summary_of_run, timepix_runs, *arguments))
+    return dict(zip(run_numbers, run_summaries))
@@ -9,7 +9,7 @@ class TimeAxis:
         units = [None, 'milli', 'micro', 'nano']
         factors = [1, 10 ** 3, 10 ** 6, 10 ** 9]
         plot_units = ['s', 'ms', '\u03BCs', 'ns']
-        index = int(np.array([i for i in range(len(units)) if units[i] == new_time_unit]))
+        index = units.index(new_time_unit)
         self.array = time_axis_in_seconds * factors[index]
         self.unit = new_time_unit
         self.plot_unit = plot_units[index]
@@ -19,8 +19,20 @@ class Tof():
 
     def __init__(self, tof, time_unit='micro', bins=100):
         time_axis = TimeAxis(tof, time_unit)
-        xlabel = 'ToF [{}]'.format(time_axis.plot_unit)
         x, y = hist_to_xy(time_axis.array, bins)
+        self.__plot(x, y, time_axis.plot_unit)
+
+    @classmethod
+    def from_summary(cls, run_summary, event_type, time_unit='micro'):
+        """ Plots the precomputed ToF spectrum of a RunSummary (camp.timepix.summary) - no events are read """
+        tof = cls.__new__(cls)
+        bin_edges = TimeAxis(run_summary.tof_bins, time_unit)
+        tof.__plot(0.5 * (bin_edges.array[1:] + bin_edges.array[:-1]), run_summary.histograms[event_type]['tof'],
+                   bin_edges.plot_unit)
+        return tof
+
+    def __plot(self, x, y, plot_unit):
+        xlabel = 'ToF [{}]'.format(plot_unit)
         plt.plot(x, y)
         plt.title('time-of-flight')
         plt.xlabel(xlabel)
@@ -45,8 +57,21 @@ class TofvsPos2D():
         time_axis = TimeAxis(tof, time_unit)
         self.bins = (bin_tof, np.linspace(0, bin_space, bin_space + 1))
         plt.hist2d(time_axis.array, dim, bins=self.bins)
+        self.__add_labels(time_axis.plot_unit)
+
+    @classmethod
+    def from_summary(cls, run_summary, event_type, dim='x', time_unit='micro'):
+        """ Plots the precomputed ToF vs *dim* ('x' or 'y') map of a RunSummary - no events are read """
+        tof_vs_pos = cls.__new__(cls)
+        bin_edges = TimeAxis(run_summary.tof_bins, time_unit)
+        tof_vs_pos.bins = (bin_edges.array, np.linspace(0, run_summary.bin_space, run_summary.bin_space + 1))
+        plt.pcolormesh(tof_vs_pos.bins[0], tof_vs_pos.bins[1], run_summary.histograms[event_type]['tof_vs_' + dim].T)
+        tof_vs_pos.__add_labels(bin_edges.plot_unit)
+        return tof_vs_pos
+
+    def __add_labels(self, plot_unit):
         plt.title('position vs time-of-flight')
-        plt.xlabel('ToF [{}]'.format(time_axis.plot_unit))
+        plt.xlabel('ToF [{}]'.format(plot_unit))
         plt.ylabel('position [px]')
         plt.show()
 
@@ -1,25 +1,138 @@
 import numpy as np
 from camp.utils.image_transform import reproject_image_into_polar
+from camp.timepix.run import Ion
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
 
+class VmiAccumulator():
+    """
+    Accumulates x, y events chunk by chunk into a VMI image of fixed size (y = 1st, x = 2nd dimension).
+    Same binning as np.histogram2d with the bin edges 0, 1, ..., 256 but computed with np.bincount
+    on the linearized pixel indices. Partial images of several workers can be merged.
+    """
+    bin_space = 256  # number of pixel
+
+    def __init__(self):
+        self.image = np.zeros((self.bin_space, self.bin_space), dtype=np.int64)
+
+    def add(self, x, y):
+        x, y = np.asarray(x), np.asarray(y)
+        inside = np.logical_and.reduce((x >= 0, x <= self.bin_space, y >= 0, y <= self.bin_space))
+        x_index = np.minimum(x[inside].astype(np.int64), self.bin_space - 1)  # x = 256 belongs to the last bin
+        y_index = np.minimum(y[inside].astype(np.int64), self.bin_space - 1)
+        counts = np.bincount(y_index * self.bin_space + x_index, minlength=self.bin_space ** 2)
+        self.image += counts.reshape(self.bin_space, self.bin_space)
+        return self
+
+    def merge(self, other):
+        self.image += other.image
+        return self
+
+
+class PolarHistogram():
+    """
+    (radius, angle) histogram of x, y events around *center* with 1 px and 1° bins, accumulated chunk by chunk.
+    Radius bin r covers [r - 0.5, r + 0.5) px, angle bin a covers [a, a + 1)° with the angle convention of the
+    polar image in VmiImage.create_radial_average (a = 180° + θ, θ = 0 along +y) - the *angles* and *radii*
+    windows of radial_distribution match the ones of create_radial_average without rasterizing an image.
+    """
+    number_of_angles = 360
+
+    def __init__(self, center, r_max=363):
+        self.center = center
+        self.counts = np.zeros((r_max, self.number_of_angles), dtype=np.int64)
+
+    @classmethod
+    def from_fragment(cls, fragments_config_file, fragment, r_max=363):
+        """ Uses center_x, center_y of *fragment* (e.g. 'fragments,I+') as center """
+        ion = Ion(fragments_config_file, fragment)
+        return cls((ion.center_x, ion.center_y), r_max=r_max)
+
+    def add(self, x, y):
+        dx = np.asarray(x, dtype=float) - self.center[0]
+        dy = np.asarray(y, dtype=float) - self.center[1]
+        radius_index = np.floor(np.hypot(dx, dy) + 0.5).astype(np.int64)
+        angle_index = np.floor(np.degrees(np.arctan2(dx, dy)) + 180).astype(np.int64) % self.number_of_angles
+        inside = radius_index < self.counts.shape[0]
+        counts = np.bincount(radius_index[inside] * self.number_of_angles + angle_index[inside],
+                             minlength=self.counts.size)
+        self.counts += counts.reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        assert self.center == other.center, 'histograms with different centers'
+        self.counts += other.counts
+        return self
+
+    def radial_distribution(self, angles=None, radii=None):
+        """
+        Returns (pixel_from_center, radial_average) - the events per px² of each radius bin
+        within the angle window *angles* (degrees, negative start wraps around) and the radius window *radii*
+        - radii beyond r_max are clipped
+        """
+        if not angles:
+            angles = (0, self.number_of_angles)
+        if not radii:
+            radii = (0, self.counts.shape[0])
+        radii = (radii[0], min(radii[1], self.counts.shape[0]))
+        angle_indices = np.arange(angles[0], angles[1]) % self.number_of_angles
+        pixel_from_center = np.arange(radii[0], radii[1])
+        counts = np.sum(self.counts[radii[0]:radii[1]][:, angle_indices], axis=1)
+        inner, outer = np.maximum(pixel_from_center - 0.5, 0), pixel_from_center + 0.5
+        areas = 0.5 * (outer ** 2 - inner ** 2) * np.radians(len(angle_indices))
+        return (pixel_from_center, counts / areas)
+
+    def angular_distribution(self, radii=None):
+        """ Returns (angles, events) - the number of events per 1° angle bin within the radius window *radii* """
+        if not radii:
+            radii = (0, self.counts.shape[0])
+        return (np.arange(self.number_of_angles), np.sum(self.counts[radii[0]:radii[1]], axis=0))
+
+
+def radial_distribution_of_run(timepix_run, event_type, fragment, angles=None, radii=None, chunk_size=None):
+    """
+    Returns the radial distribution of *fragment* around its center_x, center_y of fragments.yaml
+    computed from the events of *timepix_run* in one streaming pass
+    """
+    polar_histogram = PolarHistogram.from_fragment(timepix_run.fragments_config_file, fragment)
+    for timepix_dict in timepix_run.iter_events(event_type, ['x', 'y'], fragment=fragment, chunk_size=chunk_size):
+        polar_histogram.add(timepix_dict['x'], timepix_dict['y'])
+    return polar_histogram.radial_distribution(angles, radii)
+
+
 class VmiImage():
     bin_space = 256  # number of pixel
 
     def __init__(self, x, y):
         self.x = x
         self.y = y
+        self.__init_axes()
+        self.image = self.__create_image()
+
+    @classmethod
+    def from_image(cls, image):
+        """ Creates a VmiImage from an already binned image, e.g. VmiAccumulator.image """
+        vmi_image = cls.__new__(cls)
+        vmi_image.x = vmi_image.y = None
+        vmi_image.__init_axes()
+        vmi_image.image = np.asarray(image, dtype=float)
+        return vmi_image
+
+    @classmethod
+    def from_summary(cls, run_summary, event_type):
+        """ Creates a VmiImage from the precomputed image of a RunSummary (camp.timepix.summary) """
+        return cls.from_image(run_summary.histograms[event_type]['vmi'])
+
+    def __init_axes(self):
         self.bins = np.linspace(0, self.bin_space, self.bin_space + 1)
         self.title = 'VMI image'
         self.xlabel = 'x [px]'
         self.ylabel = 'y [px]'
-        self.image = self.__create_image()
 
     def __create_image(self):
-        ''' Transpose array results in x = 1st y = 2nd dimension '''
-        counts, xbins, ybins = np.histogram2d(self.x, self.y, bins=(self.bins, self.bins))
-        return np.transpose(counts)
+        ''' Image with x = 1st y = 2nd dimension - same as the transposed np.histogram2d(x, y) '''
+        return VmiAccumulator().add(self.x, self.y).image.astype(float)
 
     def __add_labels(self):
         plt.title(self.title)
@@ -23,3 +23,42 @@ def cfd(signal, fraction, delay=1, threshold=0):
     edge_indices = np.squeeze(np.where(edges_bool_2 == True))
 
     return edge_indices
+
+
+def cfd_batch(signals, fraction, delay=1, threshold=0, interpolate=False):
+    """Constant Fraction Discriminator for many traces at once
+
+    :param np.array signals: the inputs from the digitizer, 2-D (shots x samples)
+    :param float fraction: the fraction, from 0 to 1
+    :param int delay: the delay of the CFD in samples
+    :param float threshold: the threshold
+    :param bool interpolate: return the linearly interpolated threshold crossings instead of the sample indices
+    :return np.array edge_indices: the start and stop indices of the peaks of all shots
+    :return np.array offsets: the edges of shot i are edge_indices[offsets[i]:offsets[i + 1]]
+    """
+
+    signals = np.atleast_2d(signals)
+    assert signals.ndim == 2, 'signals have to be a 2-D array (shots x samples)'
+    assert int(delay) == delay, 'delay has to be an integer number of samples'
+    delay = int(delay)
+    number_of_samples = signals.shape[1]
+
+    # Scaled and delayed signal - same as shift(scaled, -delay, mode="nearest") of cfd() for every shot
+    scaled = signals * fraction
+    if 0 <= delay < number_of_samples:
+        delayed = np.concatenate((scaled[:, delay:], np.repeat(scaled[:, -1:], delay, axis=1)), axis=1)
+    else:
+        delayed = scaled[:, np.clip(np.arange(number_of_samples) + delay, 0, number_of_samples - 1)]
+    cfd_signal = signals - delayed
+
+    # Edge detection
+    edges_bool = cfd_signal > threshold
+    edges_bool_2 = edges_bool[:, 1:] != edges_bool[:, :-1]
+    shots, edge_indices = np.nonzero(edges_bool_2)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(shots, minlength=signals.shape[0]))))
+
+    if interpolate:
+        before, after = cfd_signal[shots, edge_indices], cfd_signal[shots, edge_indices + 1]
+        edge_indices = edge_indices + (threshold - before) / (after - before)
+
+    return edge_indices, offsets
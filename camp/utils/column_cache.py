@@ -0,0 +1,59 @@
+import os
+import hashlib
+from pathlib import Path
+import numpy as np
+from camp.utils.utils import file_signature
+
+
+class ColumnCache:
+    """
+    Local cache of HDF5 datasets as uncompressed .npy files, which are returned as read-only np.memmap.
+    The first access decompresses the dataset chunk by chunk into the cache directory, later accesses
+    only map the file. Cache files are keyed by source file, dataset name and source mtime/size,
+    the least recently used files are evicted when the cache exceeds *max_bytes*.
+    """
+
+    def __init__(self, cache_dir, max_bytes=50 * 1024 ** 3, chunk_size=10 ** 7):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def cache_file(self, hdf_file, dataset_name) -> Path:
+        key = f'{os.path.abspath(hdf_file)}:{dataset_name}:{file_signature(hdf_file)}'
+        return self.cache_dir / (hashlib.sha1(key.encode()).hexdigest() + '.npy')
+
+    def get(self, h_file, dataset_name) -> np.memmap:
+        """ Returns the dataset *dataset_name* of the open h5py.File *h_file* as memmap """
+        cache_file = self.cache_file(h_file.filename, dataset_name)
+        if cache_file.is_file():
+            os.utime(cache_file)  # mark as recently used
+        else:
+            self.__write(h_file[dataset_name], cache_file)
+            self.evict(keep=cache_file)
+        return np.load(cache_file, mmap_mode='r')
+
+    def __write(self, dset, cache_file):
+        temporary_file = cache_file.with_name(f'{cache_file.stem}.{os.getpid()}.tmp')
+        column = np.lib.format.open_memmap(temporary_file, mode='w+', dtype=dset.dtype, shape=dset.shape)
+        for start in range(0, dset.shape[0], self.chunk_size):
+            column[start:start + self.chunk_size] = dset[start:start + self.chunk_size]
+        column.flush()
+        del column
+        os.replace(temporary_file, cache_file)
+
+    def evict(self, keep=None) -> None:
+        """ Removes the least recently used cache files until the cache is smaller than max_bytes """
+        cache_files = sorted(self.cache_dir.glob('*.npy'), key=lambda cache_file: cache_file.stat().st_mtime)
+        total_bytes = sum(cache_file.stat().st_size for cache_file in cache_files)
+        for cache_file in cache_files:
+            if total_bytes <= self.max_bytes:
+                break
+            if cache_file == keep:
+                continue
+            total_bytes -= cache_file.stat().st_size
+            cache_file.unlink()
+
+    def clear(self) -> None:
+        for cache_file in self.cache_dir.glob('*.npy'):
+            cache_file.unlink()
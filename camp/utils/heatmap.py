@@ -9,29 +9,44 @@ class Heatmap():
     """
 
     def __init__(self, traces, delays, binning):
-        self.traces = traces
-        self.delays = delays
-        self.__create_image(binning)
-
-    def __create_image(self, binning):
-        self.bins = np.linspace(binning[0], binning[1], (binning[1] - binning[0]) / binning[2] + 1)
-        self.image = np.zeros((len(self.traces[0]), len(self.bins)), dtype=float)
+        self.binning = binning
+        self.bins = np.linspace(binning[0], binning[1], int(round((binning[1] - binning[0]) / binning[2])) + 1)
+        self.bin_edges = np.append(self.bins - binning[2] / 2, self.bins[-1] + binning[2] / 2)
+        self.sums = None
         self.weights = np.zeros(len(self.bins), dtype=int)
+        if len(delays) != 0:
+            self.add(traces, delays)
+
+    def add(self, traces, delays):
+        """ Adds traces (shots x samples) to the delay bins - the heatmap can be filled shot by shot """
+        traces = np.atleast_2d(np.asarray(traces, dtype=float))
+        delays = np.atleast_1d(np.asarray(delays, dtype=float))
+        assert len(traces) == len(delays), 'number of traces and delays differ'
+        if self.sums is None:
+            self.sums = np.zeros((len(self.bins), traces.shape[1]), dtype=float)
+        bin_indices = np.digitize(delays, self.bin_edges) - 1
+        inside = np.flatnonzero(np.logical_and(bin_indices >= 0, bin_indices < len(self.bins)))
+        if len(inside) != 0:
+            # sorted-segment reduction: one np.add.reduceat over the traces sorted by delay bin
+            order = inside[np.argsort(bin_indices[inside], kind='stable')]
+            sorted_bin_indices = bin_indices[order]
+            segment_starts = np.flatnonzero(np.append(True, sorted_bin_indices[1:] != sorted_bin_indices[:-1]))
+            self.sums[sorted_bin_indices[segment_starts]] += np.add.reduceat(traces[order], segment_starts, axis=0)
+            self.weights += np.bincount(sorted_bin_indices, minlength=len(self.bins))
 
-        for i in range(len(self.bins)):
-            trace_temp = []
-            weight_temp = 0
-            for j in range(len(self.delays)):
-                if self.delays[j] >= self.bins[i] - binning[2] / 2 and self.delays[j] < self.bins[i] + binning[2] / 2:
-                    trace_temp.append(self.traces[j])
-                    weight_temp += 1
-            self.image[:, i] = np.average(trace_temp, axis=0)
-            self.weights[i] = weight_temp
+    @property
+    def image(self):
+        """ Average trace of each delay bin as column - empty bins are NaN, computed on access """
+        if self.sums is None:
+            return None
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.transpose(self.sums / self.weights[:, np.newaxis])
 
     def show(self, colorbar=False, colorscale='viridis', x_ticks_on=True):
-        fig = px.imshow(self.image)
+        image = self.image
+        fig = px.imshow(image)
         fig.update_layout(xaxis=dict(scaleanchor="y",
-                                     scaleratio=self.image.shape[0] / self.image.shape[1],
+                                     scaleratio=image.shape[0] / image.shape[1],
                                      ticks="outside",
                                      tickmode='array',
                                      tickvals=(self.bins - self.bins[0]) * 1 / (self.bins[1] - self.bins[0]),
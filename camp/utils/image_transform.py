@@ -3,7 +3,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import functools
 from scipy.ndimage import map_coordinates
+from scipy import sparse
 import numpy as np
 
 
@@ -39,40 +41,93 @@ def reproject_image_into_polar(data, origin, Jacobian=False, dr=1, dt=None):
     """
     #     data = np.flipud(data) # bottom-left coordinate system requires numpy image to be np.flipud
 
-    ny, nx = data.shape[:2]
-
-    # Determine that the min and max r and theta coords will be...
-    x, y = index_coords(data, origin)  # (x,y) coordinates of each pixel
-    r, theta = cart2polar(x, y)  # convert (x,y) -> (r,θ), note θ=0 is vertical
-
-    nr = np.int(np.ceil((r.max() - r.min()) / dr))
+    plan = get_polar_transform_plan(data.shape[:2], origin, dr=dr, dt=dt)
+    output = plan.transform(data, Jacobian=Jacobian)
+    return output, plan.r_grid.copy(), plan.theta_grid.copy()  # the plan is shared by later calls
 
-    if dt is None:
-        nt = max(nx, ny)
-    else:
-        # dt in radians
-        nt = np.int(np.ceil((theta.max() - theta.min()) / dt))
 
-    # Make a regular (in polar space) grid based on the min and max r & theta
-    r_i = np.linspace(r.min(), r.max(), nr, endpoint=False)
-    theta_i = np.linspace(theta.min(), theta.max(), nt, endpoint=False)
-    theta_grid, r_grid = np.meshgrid(theta_i, r_i)
+@functools.lru_cache(maxsize=16)
+def _cached_polar_transform_plan(shape, origin, dr, dt, order):
+    return PolarTransformPlan(shape, origin, dr=dr, dt=dt, order=order)
 
-    # Project the r and theta grid back into pixel coordinates
-    X, Y = polar2cart(r_grid, theta_grid)
 
-    X += origin[0]  # We need to shift the origin
-    Y += origin[1]  # back to the bottom-left corner...
-    xi, yi = X.flatten(), Y.flatten()
-    coords = np.vstack((yi, xi))  # (map_coordinates requires a 2xn array)
+def get_polar_transform_plan(shape, origin, dr=1, dt=None, order=3):
+    """ Returns a cached PolarTransformPlan - plans are reused for identical shape, origin, dr, dt and order """
+    return _cached_polar_transform_plan(tuple(shape), tuple(origin), dr, dt, order)
 
-    zi = map_coordinates(data, coords)
-    output = zi.reshape((nr, nt))
 
-    if Jacobian:
-        output = output * r_i[:, np.newaxis]
+class PolarTransformPlan:
+    """
+    Precomputed polar grid and sampling coordinates of reproject_image_into_polar for images
+    of a given *shape*, *origin*, *dr* and *dt*. For ``order=1`` (bilinear interpolation) the
+    interpolation weights are stored as sparse matrix, so that a reprojection is one sparse
+    matrix product - for ``order=3`` (default of reproject_image_into_polar) the cached
+    coordinates are passed to map_coordinates.
+    """
 
-    return output, r_grid, theta_grid
+    def __init__(self, shape, origin, dr=1, dt=None, order=3):
+        ny, nx = shape[:2]
+        self.shape = (ny, nx)
+        self.order = order
+
+        # Determine that the min and max r and theta coords will be...
+        x, y = index_coords(np.empty(self.shape), origin)  # (x,y) coordinates of each pixel
+        r, theta = cart2polar(x, y)  # convert (x,y) -> (r,θ), note θ=0 is vertical
+
+        nr = int(np.ceil((r.max() - r.min()) / dr))
+
+        if dt is None:
+            nt = max(nx, ny)
+        else:
+            # dt in radians
+            nt = int(np.ceil((theta.max() - theta.min()) / dt))
+        self.polar_shape = (nr, nt)
+
+        # Make a regular (in polar space) grid based on the min and max r & theta
+        self.r_i = np.linspace(r.min(), r.max(), nr, endpoint=False)
+        theta_i = np.linspace(theta.min(), theta.max(), nt, endpoint=False)
+        self.theta_grid, self.r_grid = np.meshgrid(theta_i, self.r_i)
+
+        # Project the r and theta grid back into pixel coordinates
+        X, Y = polar2cart(self.r_grid, self.theta_grid)
+
+        X += origin[0]  # We need to shift the origin
+        Y += origin[1]  # back to the bottom-left corner...
+        xi, yi = X.flatten(), Y.flatten()
+        self.coords = np.vstack((yi, xi))  # (map_coordinates requires a 2xn array)
+
+        self.matrix = self.__bilinear_matrix() if order == 1 else None
+        for array in (self.r_i, self.theta_grid, self.r_grid, self.coords):
+            array.setflags(write=False)  # cached plans are shared
+
+    def __bilinear_matrix(self):
+        """ Sparse (polar pixels x image pixels) matrix - same values as map_coordinates(order=1) """
+        ny, nx = self.shape
+        yi, xi = self.coords
+        inside = np.flatnonzero(np.logical_and.reduce((yi >= 0, yi <= ny - 1, xi >= 0, xi <= nx - 1)))
+        y0, x0 = np.floor(yi[inside]).astype(np.int64), np.floor(xi[inside]).astype(np.int64)
+        wy, wx = yi[inside] - y0, xi[inside] - x0
+        y1, x1 = np.minimum(y0 + 1, ny - 1), np.minimum(x0 + 1, nx - 1)
+        rows = np.tile(inside, 4)
+        columns = np.concatenate((y0 * nx + x0, y0 * nx + x1, y1 * nx + x0, y1 * nx + x1))
+        weights = np.concatenate(((1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx))
+        return sparse.csr_matrix((weights, (rows, columns)), shape=(yi.size, ny * nx))
+
+    def transform(self, data, Jacobian=False):
+        """ Returns the polar image (r, theta) of a 2D image or the polar images of a 3D stack of images """
+        data = np.asarray(data)
+        assert data.shape[-2:] == self.shape, 'image shape does not match the plan'
+        images = data.reshape((-1,) + self.shape)
+        if self.matrix is not None:
+            output = (self.matrix @ images.reshape(len(images), -1).T).T
+        else:
+            output = np.array([map_coordinates(image, self.coords, order=self.order) for image in images])
+        output = output.reshape(data.shape[:-2] + self.polar_shape)
+
+        if Jacobian:
+            output = output * self.r_i[:, np.newaxis]
+
+        return output
 
 
 def index_coords(data, origin):
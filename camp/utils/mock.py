@@ -1,3 +1,4 @@
+import time
 import numpy as np
 
 
@@ -46,3 +47,65 @@ def create_fake_trace(length, A=1, shift=0, noise=None):
 
 
 
+
+
+class FakeDaqAccess:
+    """ Stand-in for BeamtimeDaqAccess - every train of a run returns a reproducible fake trace or image """
+
+    def __init__(self, first_train_id=1000, trains_per_run=1000, shape=(300,), noise=0.1):
+        self.first_train_id = first_train_id
+        self.trains_per_run = trains_per_run
+        self.shape = shape
+        self.noise = noise
+
+    def pulseIdIntervalOfRun(self, addr, run_number):
+        start = self.first_train_id + run_number * self.trains_per_run
+        return (start, start + self.trains_per_run)
+
+    def valuesOfInterval(self, addr, interval):
+        values = []
+        for train_id in range(interval[0], interval[1]):
+            random_state = np.random.RandomState(train_id % 2 ** 32)  # thread-safe and reproducible per train
+            if len(self.shape) == 1:
+                value = create_fake_trace(self.shape[0], shift=train_id / 100)
+            else:
+                value = create_fake_image(self.shape[0], center=(train_id % self.shape[0],) * 2)
+            values.append(value + random_state.normal(0, self.noise, value.shape))
+        return np.array(values)
+
+
+class FakePydoocs:
+    """ Stand-in for the pydoocs module - read() returns a new synthetic train *rate* times per second.
+     Addresses ending with '.HIST' return a synthetic history with a point every *history_interval* seconds. """
+
+    def __init__(self, rate=10, shape=(1000, 2), first_train_id=1, read_latency=0.0, history_interval=1.0):
+        self.rate = rate
+        self.shape = shape
+        self.first_train_id = first_train_id
+        self.read_latency = read_latency
+        self.start_time = time.time()
+        self.history_interval = history_interval
+        self.history_reads = 0
+
+    def current_train_id(self):
+        return self.first_train_id + int((time.time() - self.start_time) * self.rate)
+
+    def read(self, doocs_addr, parameters=None):
+        if self.read_latency:
+            time.sleep(self.read_latency)
+        if doocs_addr.endswith('.HIST'):
+            return self.read_history(*parameters)
+        train_id = self.current_train_id()
+        data = np.full(self.shape, train_id % 1000, dtype=float) if self.shape else float(train_id % 1000)
+        return {'data': data, 'macropulse': train_id, 'timestamp': time.time(), 'type': 'FAKE',
+                'miscellaneous': {}}
+
+    def read_history(self, start, stop, max_points=256, _=0):
+        """ Points of [start, min(stop, now)], reduced to at most *max_points* like the DOOCS history server """
+        self.history_reads += 1
+        first = np.ceil(start / self.history_interval) * self.history_interval
+        timestamps = np.arange(first, min(stop, time.time()) + 1e-9, self.history_interval)
+        if len(timestamps) > max_points:
+            timestamps = timestamps[np.linspace(0, len(timestamps) - 1, int(max_points)).astype(int)]
+        values = np.sin(2 * np.pi * timestamps / 86400) + 1e-3 * (timestamps % 7)
+        return {'data': np.column_stack((timestamps, values)).tolist(), 'type': 'FAKE', 'miscellaneous': {}}
@@ -1,4 +1,9 @@
+import os
+import copy
+import functools
+from pathlib import Path
 import numpy as np
+import yaml
 
 
 def hist_to_xy(array, bins):
@@ -8,10 +13,51 @@ def hist_to_xy(array, bins):
 
 
 def find_nearest(array, values):
-    indices = np.abs(np.subtract.outer(array, values)).argmin(0)
+    """
+    Returns the indices of the elements in *array* which are nearest to *values*
+    (the first index on ties). Uses a binary search on the sorted *array* - an unsorted
+    *array* is sorted once - instead of the full len(array) x len(values) distance matrix.
+    """
+    array = np.asarray(array)
+    values = np.asarray(values)
+    if np.all(array[1:] >= array[:-1]):
+        sorter = None
+        sorted_array = array
+    else:
+        sorter = np.argsort(array, kind='stable')
+        sorted_array = array[sorter]
+    right = np.searchsorted(sorted_array, values.ravel(), side='left')
+    left = np.searchsorted(sorted_array, sorted_array[np.maximum(right - 1, 0)], side='left')
+    right = np.minimum(right, len(array) - 1)
+    if sorter is not None:
+        left_indices, right_indices = sorter[left], sorter[right]
+    else:
+        left_indices, right_indices = left, right
+    left_distance = np.abs(sorted_array[left] - values.ravel())
+    right_distance = np.abs(sorted_array[right] - values.ravel())
+    take_right = np.logical_or(right_distance < left_distance,
+                               np.logical_and(right_distance == left_distance, right_indices < left_indices))
+    indices = np.where(take_right, right_indices, left_indices).reshape(values.shape)
+    if indices.ndim == 0:
+        return indices[()]
     return indices
 
 
+def lookup(keys, values, queries):
+    """
+    Returns the value of every element of *queries* in the table *keys* -> *values*
+    (e.g. trainID -> delay) - NaN for queries which are not in *keys*. Binary search instead of a dict.
+    """
+    keys, values, queries = np.asarray(keys), np.asarray(values, dtype=float), np.asarray(queries)
+    assert len(keys) == len(values), 'unmatching length'
+    if len(keys) == 0:
+        return np.full(queries.shape, np.nan)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    index = np.minimum(np.searchsorted(sorted_keys, queries), len(keys) - 1)
+    return np.where(sorted_keys[index] == queries, values[order][index], np.nan)
+
+
 def check_for_completeness(list):
     start, end = int(list[0]), int(list[-1])
     return sorted(set(range(start, end + 1)).difference(list))
@@ -22,3 +68,26 @@ def print_table(table):
     row_format = "".join(["{:>" + str(longest_col) + "}" for longest_col in longest_cols])
     for row in table:
         print(row_format.format(*row))
+
+
+def sidecar_file(filename, name):
+    """Returns the path of the sidecar file *name* stored next to *filename*"""
+    filename = Path(filename)
+    return filename.with_name(f'{filename.name}.{name}.h5')
+
+
+def file_signature(filename):
+    """Returns (mtime, size) of *filename* to detect changes of the file"""
+    stat = os.stat(filename)
+    return stat.st_mtime, stat.st_size
+
+
+def load_yaml(filename):
+    """Returns the content of the yaml file - parsed once per process and file version, every caller gets a copy"""
+    return copy.deepcopy(_load_yaml(str(filename), file_signature(filename)))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_yaml(filename, signature):
+    with open(filename, 'r') as ymlfile:
+        return yaml.safe_load(ymlfile)
@@ -1,5 +1,5 @@
 from beamtimedaqaccess import BeamtimeDaqAccess
-from camp.bda_utils.bda_utils import average_adc_of_run, average_image_of_run
+from camp.bda_utils.bda_utils import average_adc_of_run, average_image_of_run, reduce_run
 import matplotlib.pyplot as plt
 
 root_dir = '/asap3/flash/gpfs/bl1/2019/data/11006902/raw/hdf/online-0/'
@@ -23,5 +23,17 @@ def show_average_image_of_run(daq, run_number):
     plt.show()
 
 
+def show_std_of_trace_of_run(daq, run_number):
+    ghz_adc_addr = '/FL1/Experiment/BL1/ADQ412 GHz ADC/CH00/TD'
+    running_average = reduce_run(daq, ghz_adc_addr, run_number, section_length=1000, max_workers=8, with_std=True)
+    average, std = running_average.average(), running_average.std()
+    plt.plot(average)
+    plt.fill_between(range(len(average)), average - std, average + std, alpha=0.3)
+    plt.show()
+
+
+# without DAQ access: daq = FakeDaqAccess() from camp.utils.mock
+
 show_average_trace_of_run(daq, run_number)
 # show_average_image_of_run(daq, run_number)
+# show_std_of_trace_of_run(daq, run_number)
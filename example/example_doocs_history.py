@@ -10,3 +10,16 @@ times, pressures = history.get_doocs_history(start_time, stop_time)
 
 plt.plot(times, pressures)
 plt.show()
+
+# a week in chunks of one hour with up to 256 points each - fetched by 8 threads and cached on disk,
+# a second (overlapping) query only reads the chunks which are not in the cache yet
+history = DoocsHistory(doocs_hist_addr, cache_dir='../data/doocs_history_cache', chunk_duration=3600,
+                       points_per_chunk=256, max_workers=8)
+times, pressures = history.get_doocs_history("2018-11-14 16:00:00", "2018-11-21 16:00:00")
+
+plt.plot(times, pressures)
+plt.show()
+
+# offline with a synthetic history
+# from camp.utils.mock import FakePydoocs
+# history = DoocsHistory('FAKE/HISTORY/ADDR/VALUE.HIST', backend=FakePydoocs(history_interval=10))
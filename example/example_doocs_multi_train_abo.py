@@ -0,0 +1,13 @@
+from camp.pydoocs_utils.pydoocs_utils import MultiTrainAbo
+
+doocs_addrs = ['FLASH.FEL/ADC.SIS.BL1/EXP1.CH00/CH00.TD',  # MHz ADC
+               'FLASH.FEL/CAMP.CAM/VMI.CMOS1/IMAGE',  # camera
+               'FLASH.FEL/XGM.INTENSITY/FL1.HALL/INTENSITY.TD']  # GMD
+multi_train_abo = MultiTrainAbo(doocs_addrs)
+
+# yield trains with the samples of all channels, grouped by macropulse
+for train in multi_train_abo.trains(3):
+    print(train['macropulse'], [train[doocs_addr]['macropulse'] for doocs_addr in doocs_addrs])
+
+# save complete trains of all channels to one HDF5 file
+multi_train_abo.to_hdf('../data/test_multi.h5', ['data', 'macropulse'], 100)
@@ -1,4 +1,5 @@
 from camp.pydoocs_utils.pydoocs_utils import TrainAbo
+from camp.utils.mock import FakePydoocs
 
 
 doocs_addr = 'FLASH.FEL/ADC.SIS.BL1/EXP1.CH00/CH00.TD'  # MHz ADC
@@ -16,3 +17,18 @@ key_list = ['data', 'timestamp', 'macropulse', 'type', 'miscellaneous']
 filename = '../data/test.h5'
 
 train_abo.to_hdf(filename, key_list, 3)
+
+# record until Ctrl+C - trains are written blockwise into compressed, resizable datasets
+train_abo.to_hdf('../data/test_long.h5', key_list, -1, buffer_size=50, compression='gzip')
+
+# polling and writing in separate threads - slow writes do not stall the polling
+pipeline = train_abo.record('../data/test_pipeline.h5', key_list, 100, queue_size=1000)
+print(pipeline.statistics())
+
+# offline test without DOOCS: synthetic trains at 10 Hz
+fake_train_abo = TrainAbo(doocs_addr, backend=FakePydoocs(rate=10))
+fake_train_abo.record('../data/test_fake.h5', ['data', 'macropulse'], 20)
+
+# where does the time per train go? (read latency, validation, write)
+timed_train_abo = TrainAbo(doocs_addr, timing_hook=print)
+timed_train_abo.to_hdf('../data/test_timing.h5', key_list, 10)
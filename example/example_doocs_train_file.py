@@ -15,3 +15,17 @@ for train in range(len(macropulses)):
     plt.plot(traces[train][:, 0], traces[train][:, 1], label='trainID = {}'.format(macropulses[train]))
 plt.legend()
 plt.show()
+
+# lazy access - only the selected trains are read from disk
+with train_file:
+    data = train_file['data']
+    first_train_id = train_file.macropulses()[0]
+    traces = data[first_train_id:first_train_id + 10]
+    average_trace = data.mean()
+    std_of_trace = data.std(batch_size=50)
+    for train_ids, batch in data.batches(batch_size=50):
+        print('trains {} - {}: {}'.format(train_ids[0], train_ids[-1], batch.shape))
+
+plt.plot(average_trace[:, 0], average_trace[:, 1], label='average')
+plt.legend()
+plt.show()
@@ -0,0 +1,21 @@
+import timeit
+import numpy as np
+from camp.utils.utils import find_nearest
+
+
+def find_nearest_outer(array, values):
+    """ previous implementation - builds the full len(array) x len(values) distance matrix """
+    indices = np.abs(np.subtract.outer(array, values)).argmin(0)
+    return indices
+
+
+timestamps = np.cumsum(np.random.uniform(0.09, 0.11, 20000))  # ~30 min of 10 Hz trains
+queries = np.random.uniform(timestamps[0], timestamps[-1], 2000)
+
+assert np.array_equal(find_nearest(timestamps, queries), find_nearest_outer(timestamps, queries))
+assert np.array_equal(find_nearest(timestamps[::-1], queries), find_nearest_outer(timestamps[::-1], queries))
+
+for name, function in [('subtract.outer', find_nearest_outer), ('searchsorted', find_nearest)]:
+    for label, array in [('sorted', timestamps), ('unsorted', timestamps[::-1])]:
+        seconds = min(timeit.repeat(lambda: function(array, queries), number=1, repeat=3))
+        print(f'{name:>15} | {label:>8} | {seconds * 1000:10.2f} ms')
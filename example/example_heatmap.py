@@ -18,4 +18,9 @@ bins = [-5, 5, 1]
 
 heatmap = Heatmap(data['trace'], data['delay'], bins)
 heatmap.show()
-heatmap.frequency()
\ No newline at end of file
+heatmap.frequency()
+# fill the heatmap shot by shot, e.g. during acquisition
+streamed_heatmap = Heatmap([], [], bins)
+for delay in delays:
+    streamed_heatmap.add(create_fake_trace(length_of_trace, shift=delay, noise=0.3), delay)
+streamed_heatmap.show()
@@ -0,0 +1,16 @@
+import matplotlib.pyplot as plt
+from camp.timepix.run import TimePixRun
+from camp.timepix.centroiding import Centroider
+
+timepix_run = TimePixRun(1)
+
+# re-centroid the raw hits with a ToT threshold and a ToF window of 200 ns on all cores
+centroider = Centroider(tot_threshold=25, max_distance=1, time_window=2e-7)
+centroids = centroider.centroid_run(timepix_run)
+print('{} clusters, {} centroided events in file'.format(len(centroids['x']),
+                                                       timepix_run.number_of_centroided_events))
+centroider.to_hdf('../data/run_0001_recentroided.hdf5', centroids)
+
+plt.hist(centroids['clustersize'], bins=range(1, 30))
+plt.xlabel('clustersize')
+plt.show()
@@ -0,0 +1,23 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from camp.timepix.run import TimePixRun
+from camp.timepix.covariance import CovarianceMap, covariance_map_of_run
+
+tof_bins = np.linspace(0, 2e-5, 501)
+
+# per-train GMD values, e.g. read from the FLASH DAQ
+timepix_run = TimePixRun(1)
+trigger_Nrs, trainIDs = timepix_run.get_trainIDs()
+gmd = np.random.uniform(10, 50, len(trainIDs))
+
+covariance_map = covariance_map_of_run(timepix_run, 'centroided', tof_bins, train_ids=trainIDs, intensities=gmd)
+plt.imshow(covariance_map.partial_covariance(), origin='lower',
+           extent=[tof_bins[0], tof_bins[-1], tof_bins[0], tof_bins[-1]])
+plt.show()
+
+# covariance map of several runs
+covariance_map = CovarianceMap(tof_bins)
+for run_number in [1, 2, 3]:
+    covariance_map.merge(covariance_map_of_run(TimePixRun(run_number), 'centroided', tof_bins))
+plt.imshow(covariance_map.covariance(), origin='lower')
+plt.show()
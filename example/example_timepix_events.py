@@ -1,4 +1,6 @@
 from camp.timepix.run import TimePixRun, Filter
+from camp.timepix.query import Range, Or
+from camp.utils.column_cache import ColumnCache
 
 run_number = 863
 timepix_run = TimePixRun(run_number)
@@ -26,4 +28,31 @@ timepix_dict = timepix_run.get_events(event_type, parameters, fragment=fragment)
 print(timepix_dict.keys())
 print(len(timepix_dict['x']))
 
+# filters and fragments can be combined - every column is read once, predicates are evaluated on surviving rows
+timepix_dict = timepix_run.get_events(event_type, parameters, filter_2, fragment=fragment)
 
+# predicates of camp.timepix.query: ranges combined with And / Or
+edges_of_detector = Or(Range('x', 0, 10), Range('x', 245, 255), Range('y', 0, 10), Range('y', 245, 255))
+timepix_dict = timepix_run.get_events(event_type, parameters, edges_of_detector, Range('tot', 50, 1000))
+print(len(timepix_dict['x']))
+
+
+# iterate over events chunk by chunk for long runs
+number_of_events = 0
+for timepix_chunk in timepix_run.iter_events(event_type, parameters, filter_1, chunk_size=10 ** 6):
+    number_of_events += len(timepix_chunk['x'])
+
+print(number_of_events)
+
+# several fragments in one pass - x, y, tof are read only once
+fragments = ['fragments,I+', 'fragments,I2+', 'fragments,test_ion']
+fragment_dicts = timepix_run.get_fragments(event_type, parameters, fragments)
+print({fragment: len(fragment_dict['x']) for fragment, fragment_dict in fragment_dicts.items()})
+
+labels = timepix_run.get_fragment_labels(event_type, fragments)  # -1: no fragment
+
+# keep decompressed datasets as memory-mapped files on a local disk for repeated analysis sessions
+column_cache = ColumnCache('/tmp/timepix_cache', max_bytes=20 * 1024 ** 3)
+timepix_run = TimePixRun(run_number, column_cache=column_cache)
+timepix_dict = timepix_run.get_events(event_type, parameters, filter_1)  # first call fills the cache
+timepix_dict = timepix_run.get_events(event_type, parameters, filter_1)  # reads from the memory-mapped files
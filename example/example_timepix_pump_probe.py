@@ -0,0 +1,32 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from camp.timepix.run import TimePixRun
+from camp.timepix.pump_probe import PumpProbeRun, DelayHistogram
+
+# per-train pump-probe delays, e.g. read from the FLASH DAQ
+timepix_run = TimePixRun(1)
+trigger_Nrs, trainIDs = timepix_run.get_trainIDs()
+train_ids = trainIDs
+delays = np.random.uniform(-2, 2, len(train_ids))
+
+delay_bins = np.linspace(-2, 2, 21)
+tof_bins = np.linspace(0, 2e-5, 1001)
+radius_bins = np.arange(0, 150)
+
+pump_probe_run = PumpProbeRun(timepix_run, train_ids, delays)
+delay_tof = pump_probe_run.delay_tof_histogram('centroided', delay_bins, tof_bins)
+delay_radius = pump_probe_run.delay_radius_histogram('centroided', delay_bins, radius_bins,
+                                                     fragment='fragments,I+')
+
+plt.imshow(delay_tof.normalized().T, aspect='auto', origin='lower',
+           extent=[delay_bins[0], delay_bins[-1], tof_bins[0], tof_bins[-1]])
+plt.xlabel('delay')
+plt.ylabel('tof')
+plt.show()
+
+# runs with one delay each (pp_delay.yaml) are merged into one histogram
+delay_tof = DelayHistogram(delay_bins, tof_bins)
+for run_number in [1, 2, 3]:
+    pump_probe_run = PumpProbeRun.from_pp_delay(TimePixRun(run_number))
+    delay_tof.merge(pump_probe_run.delay_tof_histogram('centroided', delay_bins, tof_bins))
+print(delay_tof.shots)
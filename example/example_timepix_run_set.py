@@ -0,0 +1,17 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from camp.timepix.run_set import TimePixRunSet
+
+run_numbers = [175, 176, 177, 178]  # e.g. all runs at one pump-probe delay
+run_set = TimePixRunSet(run_numbers)
+
+# ToF histogram summed over all runs - each run is histogrammed in its own process
+tof_bins = np.linspace(0, 2E-5, 2001)
+counts, tof_bins = run_set.tof_histogram('centroided', tof_bins)
+plt.plot(0.5 * (tof_bins[1:] + tof_bins[:-1]), counts)
+plt.show()
+
+# VMI image of one fragment summed over all runs
+image = run_set.vmi_image('centroided', fragment='fragments,test_ion')
+plt.imshow(image, origin='lower')
+plt.show()
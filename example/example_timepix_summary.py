@@ -0,0 +1,20 @@
+import numpy as np
+from camp.timepix.run import TimePixRun
+from camp.timepix.summary import RunSummary, build_summaries
+from camp.timepix.tof import Tof, TofvsPos2D
+from camp.timepix.vmi import VmiImage
+
+# summaries of all runs of the beamtime - only missing or outdated ones are computed, in parallel
+run_summaries = build_summaries(processes=8)
+
+# the first call builds the sidecar file <hdf_file>.summary.h5, later calls only load it
+timepix_run = TimePixRun(178)
+run_summary = RunSummary.of_run(timepix_run)
+
+Tof.from_summary(run_summary, 'raw')
+TofvsPos2D.from_summary(run_summary, 'raw', dim='x')
+VmiImage.from_summary(run_summary, 'centroided').show()
+
+# other ToF binning - the summary is rebuilt and stored with the new bins
+run_summary = RunSummary.of_run(timepix_run, tof_bins=np.linspace(5e-6, 1.2e-5, 7001))
+Tof.from_summary(run_summary, 'centroided', time_unit='nano')
@@ -1,4 +1,5 @@
 from camp.timepix.run import TimePixRun
+from camp.timepix.catalog import RunCatalog
 from pprint import pprint
 
 run_number = 863  # run with trainIDs cut off at the end
@@ -14,3 +15,13 @@ triggers, trainIDs = timepix_run.get_trainIDs()
 print(f'Number of triggers: {len(triggers)} | Number of TrainIDs {len(trainIDs)}')
 
 print(f'correlation coefficient: {timepix_run.corr_coeff}')
+
+# events of selected trains - reads only the rows of the corresponding triggers
+timepix_dict = timepix_run.get_events_for_trains(trainIDs[100:200], 'centroided', ['x', 'y', 'tof'])
+print(f'Number of events in 100 trains: {len(timepix_dict["x"])}')
+
+# open many runs quickly - file resolution and metadata are cached on disk (default: data/timepix_catalog.json),
+# new entries are written once at the end of the with block
+with RunCatalog() as catalog:
+    timepix_runs = [TimePixRun(run_number, catalog=catalog) for run_number in range(860, 866)]
+    print([(timepix_run.run_number, timepix_run.get_pp_delay()) for timepix_run in timepix_runs])
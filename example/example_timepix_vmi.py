@@ -1,5 +1,5 @@
 from camp.timepix.run import TimePixRun
-from camp.timepix.vmi import VmiImage
+from camp.timepix.vmi import VmiImage, VmiAccumulator, radial_distribution_of_run
 
 run_number = 178  # short run
 timepix_run = TimePixRun(run_number)
@@ -26,3 +26,14 @@ start_radius, end_radius = 20, 100  # pixel
 
 radial_average = VmiImage(x, y).create_radial_average((x_center, y_center), angles=(start_angle, end_angle),
                                                       radii=(start_radius, end_radius))
+
+# VMI image of a long run in constant memory - accumulate chunk by chunk
+vmi_accumulator = VmiAccumulator()
+for timepix_chunk in timepix_run.iter_events('centroided', ['x', 'y'], fragment='fragments,test_ion'):
+    vmi_accumulator.add(timepix_chunk['x'], timepix_chunk['y'])
+VmiImage.from_image(vmi_accumulator.image).show()
+
+# radial distribution directly from the events around the fragment center of fragments.yaml
+pixel_from_center, radial_average = radial_distribution_of_run(timepix_run, 'centroided', 'fragments,test_ion',
+                                                               angles=(start_angle, end_angle),
+                                                               radii=(start_radius, end_radius))